@@ -11,6 +11,12 @@ version = "v4"
 
 import os
 import io
+import re
+import json
+import hashlib
+import argparse
+import concurrent.futures
+from xml.sax.saxutils import escape
 from PIL import Image
 from PIL import ImageFont
 from PIL import ImageDraw
@@ -356,43 +362,94 @@ def chrr(ascii) :
   return chr(ascii)
 
 
+# Returns the segments of a 7-segment as list of (mask,x,y,width,height), relative to the top-left of the 7-segment.
+# The rectangles are derived from the div_7s_ settings; they are shared by the raster (draw_7s) and vector (svg_7s) renderers.
+def segments_7s() :
+  x_left  = 0
+  x_mid   = div_7s_vwidth + div_7s_xsep
+  x_right = div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep
+  x_point = div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep + div_7s_vwidth + div_7s_xsep
+  y_top   = 0
+  y_upper = div_7s_hwidth + div_7s_ysep
+  y_mid   = div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep
+  y_lower = div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep
+  y_bot   = div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep
+  return [
+    (segment_a, x_mid,   y_top,   div_7s_hlen,   div_7s_hwidth),
+    (segment_b, x_right, y_upper, div_7s_vwidth, div_7s_vlen  ),
+    (segment_c, x_right, y_lower, div_7s_vwidth, div_7s_vlen  ),
+    (segment_d, x_mid,   y_bot,   div_7s_hlen,   div_7s_hwidth),
+    (segment_e, x_left,  y_lower, div_7s_vwidth, div_7s_vlen  ),
+    (segment_f, x_left,  y_upper, div_7s_vwidth, div_7s_vlen  ),
+    (segment_g, x_mid,   y_mid,   div_7s_hlen,   div_7s_hwidth),
+    (segment_p, x_point, y_bot,   div_7s_vwidth, div_7s_hwidth),
+  ]
+
+
 # Draws a 7-segment at position `(x,y)` on `draw` using color `div_7s_bgcol` for inactive segments and color `fgcolor` for active segments.
 # A segment a,b,c,d,e,f,g,p is active if the corresponding bit is set in `pattern`.
 def draw_7s(draw,x,y,pattern,fgcolor) :
-  # draw.rectangle([x,y,x+width_7s,y+height_7s],fgcolor)
-  # draw segment 'a'
-  x0 = x + div_7s_vwidth + div_7s_xsep
-  y0 = y
-  draw.rectangle([x0,y0,x0+div_7s_hlen-1,y0+div_7s_hwidth-1],fgcolor if pattern & segment_a else div_7s_bgcol)
-  # draw segment 'b'
-  x0 = x + div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep
-  y0 = y + div_7s_hwidth + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_vwidth-1,y0+div_7s_vlen-1],fgcolor if pattern & segment_b else div_7s_bgcol)
-  # draw segment 'c'
-  x0 = x + div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep
-  y0 = y + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_vwidth-1,y0+div_7s_vlen-1],fgcolor if pattern & segment_c else div_7s_bgcol)
-  # draw segment 'd'
-  x0 = x + div_7s_vwidth + div_7s_xsep
-  y0 = y + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_hlen-1,y0+div_7s_hwidth-1],fgcolor if pattern & segment_d else div_7s_bgcol)
-  # draw segment 'e'
-  x0 = x 
-  y0 = y + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_vwidth-1,y0+div_7s_vlen-1],fgcolor if pattern & segment_e else div_7s_bgcol)
-  # draw segment 'f'
-  x0 = x 
-  y0 = y + div_7s_hwidth + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_vwidth-1,y0+div_7s_vlen-1],fgcolor if pattern & segment_f else div_7s_bgcol)
-  # draw segment 'g'
-  x0 = x + div_7s_vwidth + div_7s_xsep
-  y0 = y + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_hlen-1,y0+div_7s_hwidth-1],fgcolor if pattern & segment_g else div_7s_bgcol)
-  # draw segment 'P'
-  x0 = x + div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep + div_7s_vwidth + div_7s_xsep
-  y0 = y + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep
-  draw.rectangle([x0,y0,x0+div_7s_vwidth-1,y0+div_7s_hwidth-1],fgcolor if pattern & segment_p else div_7s_bgcol)
-  
+  for mask,x0,y0,w,h in segments_7s() :
+    draw.rectangle([x+x0,y+y0,x+x0+w-1,y+y0+h-1],fgcolor if pattern & mask else div_7s_bgcol)
+
+
+# Inverse index of a font, built once: maps a pattern to the (sorted) list of chars that have that pattern.
+# Chars below `first` (the control characters) are not indexed. The font may have any size (e.g. 8-bit fonts),
+# and patterns may be any int (e.g. for 14 or 16 segment displays).
+class FontIndex :
+
+  def __init__(self,font,first=32) :
+    self.font = font
+    self._chars = {}
+    for ascii,pattern in enumerate(font) :
+      if ascii>=first : self._chars.setdefault(pattern,[]).append(ascii)
+
+  # Returns the (sorted) list of chars with `pattern` (empty if the pattern is not used).
+  def chars(self,pattern) :
+    return self._chars.get(pattern,[])
+
+  # Returns the (sorted) list of other chars with the same pattern as char `ascii`.
+  def duplicates(self,ascii) :
+    return [_ascii for _ascii in self.chars(self.font[ascii]) if _ascii!=ascii]
+
+  # Returns the lowest char with `pattern`, or None if the pattern is not used (decoding).
+  def decode(self,pattern) :
+    chars = self.chars(pattern)
+    return chars[0] if chars else None
+
+  # Returns the patterns used by more than one char, mapped to those chars (font linting).
+  def collisions(self) :
+    return {pattern:chars for pattern,chars in self._chars.items() if len(chars)>1}
+
+
+# The geometry (and background colors) of a rendered 7-segment; a change in any of these invalidates the tile cache.
+def geometry_7s() :
+  return (div_7s_hlen,div_7s_hwidth,div_7s_vlen,div_7s_vwidth,div_7s_xsep,div_7s_ysep,div_7s_bgcol,div_grid_bgcol)
+
+
+# Cache of pre-rendered 7-segment tiles, keyed on (pattern,fgcolor,geometry_7s())
+_tile_cache = {}
+
+
+# Returns an image of a 7-segment with `pattern` in color `fgcolor` on a `div_grid_bgcol` background (including the p segment).
+# Each tile is rendered once with draw_7s(), and then taken from the cache.
+def tile_7s(pattern,fgcolor) :
+  key = (pattern,fgcolor,geometry_7s())
+  tile = _tile_cache.get(key)
+  if tile is None :
+    # Computed from the geometry (not from width_7s/height_7s), since the geometry may have changed; p segment is right of the 7-segment
+    width  = div_7s_vwidth + div_7s_xsep + div_7s_hlen + div_7s_xsep + div_7s_vwidth + div_7s_xsep + div_7s_vwidth
+    height = div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth + div_7s_ysep + div_7s_vlen + div_7s_ysep + div_7s_hwidth
+    tile = Image.new("RGBA", (width,height), div_grid_bgcol )
+    draw_7s( ImageDraw.Draw(tile), 0, 0, pattern, fgcolor )
+    _tile_cache[key] = tile
+  return tile
+
+
+# Pastes a 7-segment at position `(x,y)` on `image`; same result as draw_7s() on a `div_grid_bgcol` background, but from the tile cache.
+def paste_7s(image,x,y,pattern,fgcolor) :
+  image.paste( tile_7s(pattern,fgcolor), (x,y) )
+
 
 def table_ascii(font7s,font7sname) :
   # Compute size for image to generate
@@ -403,6 +460,7 @@ def table_ascii(font7s,font7sname) :
   draw = ImageDraw.Draw(image)
   mainfont = ImageFont.truetype(div_mainfont_name, div_mainfont_size)
   smallfont = ImageFont.truetype(div_smallfont_name, div_smallfont_size)
+  index = FontIndex(font7s)
   # Create the grid
   for yy in range(div_grid_yfirst,div_grid_ylast+1) :
     y0 = (yy-div_grid_yfirst)*(div_grid_a_vlen+div_grid_vsep) + div_grid_vsep
@@ -425,7 +483,7 @@ def table_ascii(font7s,font7sname) :
       y += div_mainfont_size
       # Draw the duplicate hex numbers: (hex numbers of) chars with same pattern
       pattern = font7s[ascii]
-      otherchars = [_ascii for _ascii,_pattern in enumerate(font7s) if _ascii!=ascii and _pattern==pattern and _ascii>=32]
+      otherchars = index.duplicates(ascii)
       if len(otherchars)==0 : 
         label = "no"
         label2 = "duplicates"
@@ -443,7 +501,7 @@ def table_ascii(font7s,font7sname) :
       draw.text( (x0+(div_grid_a_hlen-sizex)//2,y), label, col, font=smallfont)
       y += div_smallfont_size+4
       # Draw the 7-segment
-      draw_7s( draw, x0+(div_grid_a_hlen-width_7s)//2, y, pattern, div_7s_fgcol )
+      paste_7s( image, x0+(div_grid_a_hlen-width_7s)//2, y, pattern, div_7s_fgcol )
       # Draw the pattern
       label = bin8(pattern)
       sizex,sizey= draw.textsize( label, font=smallfont)
@@ -469,6 +527,7 @@ def table_pattern(font7s,font7sname) :
   mainfont = ImageFont.truetype(div_mainfont_name, div_mainfont_size)
   mediumfont = ImageFont.truetype(div_mediumfont_name, div_mediumfont_size)
   smallfont = ImageFont.truetype(div_smallfont_name, div_smallfont_size)
+  index = FontIndex(font7s)
   # Create the grid
   for yy in range(8) :
     y0 = yy*(div_grid_s_vlen+div_grid_vsep) + div_grid_vsep
@@ -486,7 +545,7 @@ def table_pattern(font7s,font7sname) :
       draw.text( (x0+(div_grid_s_hlen-sizex)//2, y), label, div_lotext_color, font=mediumfont)
       y += div_mediumfont_size+2
       # Draw the duplicate hex numbers: (hex numbers of) chars with same pattern
-      chars = [_ascii for _ascii,_pattern in enumerate(font7s) if _pattern==pattern and _ascii>=32]
+      chars = index.chars(pattern)
       if len(chars)==0 : 
         label = "not"
         label2 = "used"
@@ -506,7 +565,7 @@ def table_pattern(font7s,font7sname) :
       draw.text( (x0+(div_grid_s_hlen-sizex)//2,y), label, col_label, font=smallfont)
       y += div_smallfont_size+4
       # Draw the 7-segment
-      draw_7s( draw, x0+(div_grid_s_hlen-width_7s)//2, y, pattern, col_7s )
+      paste_7s( image, x0+(div_grid_s_hlen-width_7s)//2, y, pattern, col_7s )
   # Draw title cell
   x0 = div_grid_hsep
   y0 = 8*(div_grid_s_vlen+div_grid_vsep) + div_grid_vsep
@@ -518,20 +577,226 @@ def table_pattern(font7s,font7sname) :
   return image
 
 
-def main(font7s,font7sname) :
-  print( f"processing '{font7sname}'")
-  image = table_ascii(font7s,font7sname)
-  filename = f"{font7sname}_ascii.png"
-  image.save(filename)
-  print( f"  saving {filename}")
-  image = table_pattern(font7s,font7sname)
-  filename = f"{font7sname}_pattern.png"
-  image.save(filename)
-  print( f"  saving {filename}")
+# The segment names, as used in the ids of the SVG symbols
+segment_names = { segment_a:"a", segment_b:"b", segment_c:"c", segment_d:"d", segment_e:"e", segment_f:"f", segment_g:"g", segment_p:"p" }
+
+
+# Writes the opening <svg> tag for an image of `width` x `height` (shown at `scale`), and the <symbol>s used by svg_7s():
+# one per segment (taking the fill color of the referencing <use>), and one for a 7-segment with all segments inactive.
+def svg_begin(file,width,height,scale=1) :
+  file.write( f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{width*scale}" height="{height*scale}" viewBox="0 0 {width} {height}">\n' )
+  file.write( '<defs>\n' )
+  for mask,x0,y0,w,h in segments_7s() :
+    file.write( f'<symbol id="seg_{segment_names[mask]}" overflow="visible"><rect x="{x0}" y="{y0}" width="{w}" height="{h}"/></symbol>\n' )
+  file.write( f'<symbol id="seg_off" overflow="visible" fill="{div_7s_bgcol}">' )
+  file.write( "".join( f'<use xlink:href="#seg_{name}"/>' for name in segment_names.values() ) )
+  file.write( '</symbol>\n' )
+  file.write( '</defs>\n' )
 
 
-# The entry point for command line test
+def svg_end(file) :
+  file.write( '</svg>\n' )
+
+
+# Writes a 7-segment at position `(x,y)` to SVG `file`; same as draw_7s(), but referencing the symbols written by svg_begin().
+def svg_7s(file,x,y,pattern,fgcolor) :
+  file.write( f'<use xlink:href="#seg_off" x="{x}" y="{y}"/>' )
+  for mask,name in segment_names.items() :
+    if pattern & mask : file.write( f'<use xlink:href="#seg_{name}" x="{x}" y="{y}" fill="{fgcolor}"/>' )
+  file.write( '\n' )
+
+
+# Writes a filled rectangle to SVG `file`; the coordinates are inclusive, as for draw.rectangle().
+def svg_rect(file,x0,y0,x1,y1,fill) :
+  file.write( f'<rect x="{x0}" y="{y0}" width="{x1-x0+1}" height="{y1-y0+1}" fill="{fill}"/>\n' )
+
+
+# Writes text `label` to SVG `file` with its top at `y` (as draw.text() does); `anchor` is start, middle or end for `x`.
+# The text is not measured; the viewer aligns it (in the generic monospace font if Consolas is not available).
+def svg_text(file,x,y,label,color,size,anchor="start") :
+  file.write( f'<text x="{x}" y="{y+size*4//5}" fill="{color}" font-size="{size}" text-anchor="{anchor}">{escape(label)}</text>\n' )
+
+
+# Writes the ASCII table (same layout as table_ascii) as SVG to `file`, streaming the elements.
+def svg_table_ascii(file,font7s,font7sname,scale=1) :
+  width  = div_grid_xcount*div_grid_a_hlen + (div_grid_xcount+1)*div_grid_hsep
+  height = grid_ycount*div_grid_a_vlen + (grid_ycount+1)*div_grid_vsep       + div_grid_title + div_grid_vsep
+  svg_begin(file,width,height,scale)
+  file.write( f'<rect width="{width}" height="{height}" fill="{div_grid_linecol}"/>\n' )
+  file.write( '<g font-family="Consolas,monospace" font-weight="bold">\n' )
+  index = FontIndex(font7s)
+  for yy in range(div_grid_yfirst,div_grid_ylast+1) :
+    y0 = (yy-div_grid_yfirst)*(div_grid_a_vlen+div_grid_vsep) + div_grid_vsep
+    y1 = y0+div_grid_a_vlen-1
+    for xx in range(div_grid_xcount) :
+      y = y0+1 # vertical cursor in cell
+      ascii = yy*div_grid_xcount+xx
+      x0 = xx*(div_grid_a_hlen+div_grid_hsep) + div_grid_hsep
+      x1 = x0+div_grid_a_hlen-1
+      xm = x0+div_grid_a_hlen//2
+      svg_rect(file,x0,y0,x1,y1,div_grid_bgcol)
+      svg_text(file,x0+4,y,f"{ascii:02X}",div_lotext_color,div_mainfont_size)
+      svg_text(file,x1-4,y,chrr(ascii),div_hitext_color,div_mainfont_size,"end")
+      y += div_mainfont_size
+      pattern = font7s[ascii]
+      otherchars = index.duplicates(ascii)
+      if len(otherchars)==0 : 
+        label = "no"
+        label2 = "duplicates"
+        col = div_lotext_color
+      else :
+        label = ' '.join(map(hex2,otherchars))
+        label2 = '  '.join(map(chrr,otherchars))
+        col = div_7s_fgerror
+      svg_text(file,xm,y,label,col,div_smallfont_size,"middle")
+      y += div_smallfont_size+2
+      svg_text(file,xm,y,label2,col,div_smallfont_size,"middle")
+      y += div_smallfont_size+4
+      svg_7s(file,x0+(div_grid_a_hlen-width_7s)//2,y,pattern,div_7s_fgcol)
+      svg_text(file,xm,y1-2-div_smallfont_size,bin8(pattern),div_lotext_color,div_smallfont_size,"middle")
+  x0 = div_grid_hsep
+  y0 = grid_ycount*(div_grid_a_vlen+div_grid_vsep) + div_grid_vsep
+  svg_rect(file,x0,y0,x0+width-2*div_grid_hsep-1,y0+div_grid_title-1,div_grid_bgcol)
+  svg_text(file,width//2,y0+(div_grid_title-div_mainfont_size)//2+2,f"ASCII table for font '{font7sname}'",div_hitext_color,div_mainfont_size,"middle")
+  file.write( '</g>\n' )
+  svg_end(file)
+
+
+# Writes the pattern table (same layout as table_pattern) as SVG to `file`, streaming the elements.
+def svg_table_pattern(file,font7s,font7sname,scale=1) :
+  width  = 16*div_grid_s_hlen + (16+1)*div_grid_hsep
+  height = 8*div_grid_s_vlen + (8+1)*div_grid_vsep       + div_grid_title + div_grid_vsep
+  svg_begin(file,width,height,scale)
+  file.write( f'<rect width="{width}" height="{height}" fill="{div_grid_linecol}"/>\n' )
+  file.write( '<g font-family="Consolas,monospace" font-weight="bold">\n' )
+  index = FontIndex(font7s)
+  for yy in range(8) :
+    y0 = yy*(div_grid_s_vlen+div_grid_vsep) + div_grid_vsep
+    y1 = y0+div_grid_s_vlen-1
+    for xx in range(16) :
+      y = y0+1 # vertical cursor in cell
+      pattern = yy*div_grid_xcount+xx
+      x0 = xx*(div_grid_s_hlen+div_grid_hsep) + div_grid_hsep
+      x1 = x0+div_grid_s_hlen-1
+      xm = x0+div_grid_s_hlen//2
+      svg_rect(file,x0,y0,x1,y1,div_grid_bgcol)
+      svg_text(file,xm,y,bin8(pattern),div_lotext_color,div_mediumfont_size,"middle")
+      y += div_mediumfont_size+2
+      chars = index.chars(pattern)
+      if len(chars)==0 : 
+        label = "not"
+        label2 = "used"
+        col_label = div_lotext_color
+        col_7s = div_7s_fgfree
+      else :
+        label = ' '.join(map(hex2,chars))
+        label2 = '  '.join(map(chrr,chars))
+        col_label = div_hitext_color if len(chars)==1 else div_7s_fgerror
+        col_7s = div_7s_fgcol
+      svg_text(file,xm,y,label,col_label,div_smallfont_size,"middle")
+      y += div_smallfont_size+2
+      svg_text(file,xm,y,label2,col_label,div_smallfont_size,"middle")
+      y += div_smallfont_size+4
+      svg_7s(file,x0+(div_grid_s_hlen-width_7s)//2,y,pattern,col_7s)
+  x0 = div_grid_hsep
+  y0 = 8*(div_grid_s_vlen+div_grid_vsep) + div_grid_vsep
+  svg_rect(file,x0,y0,x0+width-2*div_grid_hsep-1,y0+div_grid_title-1,div_grid_bgcol)
+  svg_text(file,width//2,y0+(div_grid_title-div_mainfont_size)//2+2,f"Pattern table for font '{font7sname}'",div_hitext_color,div_mainfont_size,"middle")
+  file.write( '</g>\n' )
+  svg_end(file)
+
+
+# The built-in fonts, by name
+fonts = { "unique7s":font_unique7s, "lookalike7s":font_lookalike7s }
+
+# The table kinds, by name
+table_kinds = { "ascii":table_ascii, "pattern":table_pattern }
+
+# The SVG writers of the table kinds, by name
+svg_table_kinds = { "ascii":svg_table_ascii, "pattern":svg_table_pattern }
+
+# The output formats
+table_formats = ( "png", "svg" )
+
+
+# Returns (name,font) for `spec`: the name of a built-in font, or the path of a font file.
+# A font file lists the patterns (0b.., 0x.. or decimal, separated by commas or white space), with # or // comments,
+# so the lists in this file and in firmware/SSoS/font.cpp can be copied as is. The name is the file name without extension.
+# Raises ValueError when the file does not have a pattern for each of the 128 ASCII chars.
+def load_font(spec) :
+  if spec in fonts : return spec, fonts[spec]
+  with open(spec) as file :
+    text = re.sub(r"(#|//).*","",file.read())
+  font = [int(word,0) for word in re.findall(r"0[bB][01_]+|0[xX][0-9a-fA-F_]+|\d+",text)]
+  if len(font)!=128 : raise ValueError(f"{spec}: a font has 128 patterns (one per ASCII char), found {len(font)}")
+  return os.path.splitext(os.path.basename(spec))[0], font
+
+
+# Returns the file name for the `kind` table of font `name` at `scale` in format `fmt`.
+def table_filename(name,kind,scale,fmt="png") :
+  return f"{name}_{kind}.{fmt}" if scale==1 else f"{name}_{kind}@{scale}x.{fmt}"
+
+
+# Returns a hash of everything that determines the image: the font (name and patterns), the table kind, scale and format, and the layout (all div_ settings).
+def table_hash(name,font,kind,scale,fmt="png") :
+  layout = sorted( (key,value) for key,value in globals().items() if key.startswith("div_") )
+  return hashlib.sha256( repr((version,name,list(font),kind,scale,fmt,layout)).encode() ).hexdigest()
+
+
+# Renders the `kind` table for `font` at (integer) `scale` in format `fmt` and saves it as `path` (runs in a worker process).
+# For png, scaling is a nearest-neighbor resize, so pixels stay crisp; for svg, the elements are streamed to the file and scale only sets the displayed size.
+def render_table(name,font,kind,scale,path,fmt="png") :
+  if fmt=="svg" :
+    with open(path,"w",encoding="utf-8") as file :
+      svg_table_kinds[kind](file,font,name,scale)
+    return path
+  image = table_kinds[kind](font,name)
+  if scale!=1 : image = image.resize( (image.width*scale,image.height*scale), Image.NEAREST )
+  image.save(path)
+  return path
+
+
+# Renders all tables (`kinds` x `scales` x `fmts`) for all `fontspecs` into `outdir`, in a process pool (`workers` processes).
+# Tables whose hash (font, kind, scale, format, layout) did not change since the last run (and whose file exists) are skipped,
+# unless `force`. The hashes are kept in `tables.json` in `outdir`.
+def render_tables(fontspecs,kinds=("ascii","pattern"),scales=(1,),outdir=".",workers=None,force=False,fmts=("png",)) :
+  manifest_path = os.path.join(outdir,"tables.json")
+  manifest = {}
+  if os.path.exists(manifest_path) :
+    with open(manifest_path) as file :
+      manifest = json.load(file)
+  jobs = []
+  for spec in fontspecs :
+    name,font = load_font(spec)
+    for kind in kinds :
+      for scale in scales :
+        for fmt in fmts :
+          filename = table_filename(name,kind,scale,fmt)
+          path = os.path.join(outdir,filename)
+          hash = table_hash(name,font,kind,scale,fmt)
+          if not force and manifest.get(filename)==hash and os.path.exists(path) :
+            print( f"  skipping {filename} (unchanged)")
+            continue
+          manifest[filename] = hash
+          jobs.append( (name,font,kind,scale,path,fmt) )
+  if jobs :
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool :
+      for path in pool.map(render_table,*zip(*jobs)) :
+        print( f"  saving {path}")
+  with open(manifest_path,"w") as file :
+    json.dump(manifest,file,indent=2,sort_keys=True)
+
+
+# The entry point for command line use; without arguments renders the built-in fonts as before
 if __name__ == "__main__":
   print( f"tables.py {version}")
-  main(font_unique7s,"unique7s")
-  main(font_lookalike7s,"lookalike7s")
+  parser = argparse.ArgumentParser(description="Render font tables for 7-segment fonts")
+  parser.add_argument("fonts", nargs="*", default=["unique7s","lookalike7s"], help="built-in font name or font file (default: all built-in fonts)")
+  parser.add_argument("--table", default="ascii,pattern", help="comma separated table kinds (default ascii,pattern)")
+  parser.add_argument("--scale", default="1", help="comma separated integer scales (default 1)")
+  parser.add_argument("--format", default="png", help="comma separated output formats, png and/or svg (default png)")
+  parser.add_argument("--outdir", default=".", help="output directory (default .)")
+  parser.add_argument("--workers", type=int, help="number of processes (default one per CPU)")
+  parser.add_argument("--force", action="store_true", help="also render tables that did not change")
+  args = parser.parse_args()
+  render_tables(args.fonts,args.table.split(","),[int(scale) for scale in args.scale.split(",")],args.outdir,args.workers,args.force,args.format.split(","))
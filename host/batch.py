@@ -0,0 +1,142 @@
+# batch.py - Coalesces many small writes into one write per frame (or per deadline)
+# Producers write one command at a time, often one or two bytes (b'\x06A', b'\b2'). Every write() is a system call and,
+# on USB serial adapters, often a USB transfer of its own (with a latency of ~1 ms). The BatchWriter collects the writes
+# in a preallocated buffer, in order, and writes them to the port in one go: at the end of a frame, at an explicit flush(),
+# before a sleep() (the flush point of timed demos), when the buffer is full, or when the oldest byte waited `deadline` seconds.
+#
+#   python batch.py   compares the frame rate with and without batching, for a model of a USB serial adapter (virtual time)
+
+import time
+import threading
+import contextlib
+
+
+# Wraps serial port `ser` (anything with write()); collects writes in a buffer of `size` bytes.
+# With `deadline` (seconds), a thread flushes bytes that waited that long (so they are sent even when no flush point follows).
+# Also stands in for module `time` (sleep() flushes first), so it can replace both `ssos` and `time` of the manual's examples.
+class BatchWriter :
+
+  def __init__(self,ser,size=256,deadline=None,clock=time) :
+    self.ser = ser
+    self.clock = clock
+    self.deadline = deadline
+    self._buf = bytearray(size)
+    self._length = 0
+    self._since = None # time of the oldest byte in the buffer
+    self.writes_in = 0   # write() calls of the producer
+    self.writes_out = 0  # write() calls on the port
+    self.bytecount = 0
+    self._cond = threading.Condition()
+    self._closed = False
+    if deadline is not None :
+      self._thread = threading.Thread(target=self._run,daemon=True)
+      self._thread.start()
+
+  def write(self,data) :
+    n = len(data)
+    with self._cond :
+      self.writes_in += 1
+      if self._length+n>len(self._buf) : self._flush()
+      if n>len(self._buf) :
+        self._write(data) # too big for the buffer: it goes out as is (after the bytes before it)
+        return n
+      self._buf[self._length:self._length+n] = data
+      if self._since is None :
+        self._since = self.clock.monotonic()
+        self._cond.notify()
+      self._length += n
+    return n
+
+  def _write(self,data) :
+    self.ser.write(data)
+    self.writes_out += 1
+    self.bytecount += len(data)
+
+  # Writes the buffer to the port; the caller holds the lock.
+  def _flush(self) :
+    if self._length :
+      self._write(bytes(self._buf[:self._length]))
+      self._length = 0
+    self._since = None
+
+  # Writes the collected bytes to the port now.
+  def flush(self) :
+    with self._cond :
+      self._flush()
+
+  # A logical frame: `with batch.frame(): ...` writes everything written in the body in one go, at the end of the body.
+  @contextlib.contextmanager
+  def frame(self) :
+    try :
+      yield self
+    finally :
+      self.flush()
+
+  # Flushes, then sleeps (a flush point: what was written before a sleep is shown during the sleep).
+  def sleep(self,seconds) :
+    self.flush()
+    self.clock.sleep(seconds)
+
+  # The deadline thread: flushes when the oldest byte waited `deadline` seconds.
+  def _run(self) :
+    with self._cond :
+      while not self._closed :
+        if self._since is None :
+          self._cond.wait()
+          continue
+        wait = self._since+self.deadline-self.clock.monotonic()
+        if wait>0 : self._cond.wait(wait)
+        else : self._flush()
+
+  # Reads flush first: the reply may be to a command that is still in the buffer (e.g. SHOW-STRINGS).
+  def read(self,size=1) :
+    self.flush()
+    return self.ser.read(size)
+
+  @property
+  def in_waiting(self) :
+    self.flush()
+    return self.ser.in_waiting
+
+  # Flushes, and stops the deadline thread (the port is not closed).
+  def close(self) :
+    with self._cond :
+      self._flush()
+      self._closed = True
+      self._cond.notify()
+
+  def __enter__(self) :
+    return self
+
+  def __exit__(self,*args) :
+    self.close()
+
+
+# The entry point for command line use: a counter, written per command (PATTERN-ONE per unit), with and without batching.
+# The port is a model of a USB serial adapter: every write() is a USB transfer that costs `latency`, plus the bytes on the wire.
+if __name__ == "__main__":
+  from protocol import BYTE_US, UNITCOUNT, CMD_CURSOR_HOME, CMD_PATTERN_ONE
+  from virtualclock import VirtualClock
+  from emulator import SSoSEmulator
+  from font7s import encode_text
+
+  class UsbSerial :
+    def __init__(self,clock,latency=0.001) :
+      self.clock = clock
+      self.latency = latency
+      self.emulator = SSoSEmulator()
+    def write(self,data) :
+      self.clock.sleep( self.latency + len(data)*BYTE_US/1_000_000 )
+      return self.emulator.write(data)
+
+  frames = [ encode_text(f"{i:4d}",width=UNITCOUNT) for i in range(1000) ]
+  for batched in (False,True) :
+    clock = VirtualClock()
+    usb = UsbSerial(clock)
+    out = BatchWriter(usb,clock=clock) if batched else usb
+    for patterns in frames :
+      out.write( bytes([CMD_CURSOR_HOME]) )
+      for pattern in patterns : out.write( bytes([CMD_PATTERN_ONE,pattern]) )
+      if batched : out.flush()
+    assert usb.emulator.patterns()==tuple(frames[-1])
+    print( f"{'batched  ' if batched else 'unbatched'}: {len(frames)/clock.now:6.0f} frames/s" + (f" ({out.writes_in} writes in, {out.writes_out} out)" if batched else "") )
@@ -0,0 +1,197 @@
+# capture.py - Records what a host sends to an SSoS device, and replays it (memory mapped) at 1x, Nx or unthrottled speed
+#
+# File format (little endian):
+#   header  "SSoSCAP1" + float64 wall clock time of the start of the recording
+#   record  varint delta (microseconds since the previous record, monotonic clock) + varint length + the bytes of one write
+#   index   (on close) uint64 offset + uint64 time (microseconds) of every INDEX_EVERY-th record
+#   footer  uint64 offset of the index + uint64 record count + uint64 time of the last record (microseconds) + "SSoSEND1"
+# A capture without footer (e.g. the recorder crashed) can still be replayed; it is then scanned from the start.
+#
+#   python capture.py info FILE
+#   python capture.py replay FILE [--port PORT | --emulator] [--speed N | --fast] [--start S]
+
+import time
+import mmap
+import bisect
+import struct
+import argparse
+
+
+MAGIC = b"SSoSCAP1"
+MAGIC_END = b"SSoSEND1"
+HEADER = struct.Struct("<8sd")
+INDEX_ENTRY = struct.Struct("<QQ")
+FOOTER = struct.Struct("<QQQ8s")
+INDEX_EVERY = 256 # records per index entry
+
+
+def _varint(value) :
+  data = bytearray()
+  while value>=0x80 :
+    data.append(value & 0x7F | 0x80)
+    value >>= 7
+  data.append(value)
+  return data
+
+
+# Wraps the serial port (or anything with write()) of a host, and records every write with its timestamp in file `path`.
+# Reads are passed on. Time is taken from `clock` (module `time`, or a VirtualClock). Pass `ser=None` to only record.
+class CaptureRecorder :
+
+  def __init__(self,ser,path,clock=time) :
+    self.ser = ser
+    self.clock = clock
+    self.file = open(path,"wb")
+    self.file.write( HEADER.pack(MAGIC,clock.time()) )
+    self.offset = HEADER.size
+    self.start = clock.monotonic()
+    self.last_us = 0
+    self.count = 0
+    self.index = []
+
+  def write(self,data) :
+    now_us = max(self.last_us,round((self.clock.monotonic()-self.start)*1_000_000))
+    if self.count % INDEX_EVERY==0 : self.index.append( (self.offset,now_us) )
+    record = _varint(now_us-self.last_us) + _varint(len(data)) + bytes(data)
+    self.file.write(record)
+    self.offset += len(record)
+    self.last_us = now_us
+    self.count += 1
+    return self.ser.write(data) if self.ser is not None else len(data)
+
+  def read(self,size=1) :
+    return self.ser.read(size)
+
+  @property
+  def in_waiting(self) :
+    return self.ser.in_waiting
+
+  # Writes the index and the footer, and closes the file (not the serial port).
+  def close(self) :
+    for offset,time_us in self.index :
+      self.file.write( INDEX_ENTRY.pack(offset,time_us) )
+    self.file.write( FOOTER.pack(self.offset,self.count,self.last_us,MAGIC_END) )
+    self.file.close()
+
+  def __enter__(self) :
+    return self
+
+  def __exit__(self,*args) :
+    self.close()
+
+
+# Reads a capture via mmap, so captures of any size are not loaded in memory.
+class CaptureReader :
+
+  def __init__(self,path) :
+    self.file = open(path,"rb")
+    self.mm = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+    if len(self.mm)<HEADER.size or self.mm[:len(MAGIC)]!=MAGIC : raise ValueError(f"{path} is not an SSoS capture")
+    magic,self.wallclock = HEADER.unpack_from(self.mm,0)
+    self.index = [] # (time in microseconds, offset)
+    self.end = len(self.mm) # end of the records
+    self.count = None       # number of records (None if the capture has no footer)
+    self.duration = None    # time of the last record in seconds (None if the capture has no footer)
+    if len(self.mm)>=HEADER.size+FOOTER.size :
+      index_offset,count,last_us,magic = FOOTER.unpack_from(self.mm,len(self.mm)-FOOTER.size)
+      if magic==MAGIC_END :
+        self.end = index_offset
+        self.count = count
+        self.duration = last_us/1_000_000
+        for i in range(index_offset,len(self.mm)-FOOTER.size,INDEX_ENTRY.size) :
+          offset,time_us = INDEX_ENTRY.unpack_from(self.mm,i)
+          self.index.append( (time_us,offset) )
+
+  def _varint(self,offset) :
+    mm = self.mm
+    value = 0
+    shift = 0
+    while True :
+      byte = mm[offset]
+      offset += 1
+      value |= (byte & 0x7F) << shift
+      if byte<0x80 : return value,offset
+      shift += 7
+
+  # Yields (time in seconds, bytes) for every record at or after `start` seconds; uses the index to skip to `start`.
+  def records(self,start=0.0) :
+    start_us = round(start*1_000_000)
+    offset = HEADER.size
+    time_us = 0
+    if self.index :
+      # The last indexed record before `start`: records at `start` may come before an indexed record at `start`
+      time_us,offset = self.index[max(0,bisect.bisect_left(self.index,(start_us,))-1)]
+      # The delta of the indexed record is relative to the record before it; it is re-added below
+      delta,_ = self._varint(offset)
+      time_us -= delta
+    while offset<self.end :
+      try :
+        delta,offset = self._varint(offset)
+        length,offset = self._varint(offset)
+      except IndexError : # truncated capture
+        return
+      if offset+length>self.end : return # truncated capture
+      time_us += delta
+      if time_us>=start_us : yield time_us/1_000_000, self.mm[offset:offset+length]
+      offset += length
+
+  def close(self) :
+    self.mm.close()
+    self.file.close()
+
+  def __enter__(self) :
+    return self
+
+  def __exit__(self,*args) :
+    self.close()
+
+
+# Writes the records of `reader` (from `start` seconds) to `out` (anything with write(): a serial port, an SSoSEmulator, ...).
+# With `speed` 1 the original timing is reproduced, with N it is N times faster, with None the records are written unthrottled.
+# Returns (records,bytes) written.
+def replay(reader,out,speed=1.0,start=0.0,clock=time) :
+  records = 0
+  count = 0
+  t0 = clock.monotonic()
+  for t,data in reader.records(start) :
+    if speed :
+      wait = t0+(t-start)/speed-clock.monotonic()
+      if wait>0 : clock.sleep(wait)
+    out.write(data)
+    records += 1
+    count += len(data)
+  return records,count
+
+
+# The entry point for command line use
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Show or replay an SSoS capture")
+  parser.add_argument("command", choices=["info","replay"])
+  parser.add_argument("file")
+  parser.add_argument("--port", help="replay to this serial port or pty (opened without resetting the board)")
+  parser.add_argument("--emulator", action="store_true", help="replay to an emulator, and print its display at the end (the default)")
+  parser.add_argument("--speed", type=float, default=1.0, help="replay N times faster (default 1)")
+  parser.add_argument("--fast", action="store_true", help="replay unthrottled")
+  parser.add_argument("--start", type=float, default=0.0, help="start at this time (seconds) in the capture")
+  args = parser.parse_args()
+  with CaptureReader(args.file) as reader :
+    if args.command=="info" :
+      started = time.strftime("%Y-%m-%d %H:%M:%S",time.localtime(reader.wallclock))
+      if reader.count is None :
+        print( f"{args.file}: recorded {started}, no index (incomplete capture)" )
+      else :
+        print( f"{args.file}: recorded {started}, {reader.count} writes, {reader.duration:.3f} s, {reader.end-HEADER.size} bytes of records" )
+    elif args.port :
+      from pool import open_port
+      ser = open_port(args.port)
+      start = time.perf_counter()
+      records,count = replay(reader,ser,None if args.fast else args.speed,args.start)
+      ser.flush()
+      print( f"replayed {records} writes ({count} bytes) to {args.port} in {time.perf_counter()-start:.3f} s" )
+    else :
+      from emulator import SSoSEmulator
+      emulator = SSoSEmulator()
+      start = time.perf_counter()
+      records,count = replay(reader,emulator,None if args.fast else args.speed,args.start)
+      print( f"replayed {records} writes ({count} bytes) to the emulator in {time.perf_counter()-start:.3f} s" )
+      print( "display " + " ".join(f"{p:02X}" for p in emulator.patterns()) )
@@ -0,0 +1,121 @@
+# decoder.py - Incremental decoder of the SSoS wire protocol (the bytes the host sends), for sniffers and emulators
+# Follows loop() of the firmware: a byte whose lower 7 bits are below 0x20 starts a command (if app_cmd_len[] is not 0 for it,
+# otherwise it is ignored), the command collects its arguments (any byte, also across chunks), and all other bytes are chars.
+# Runs of chars are returned as memoryview slices of the fed chunk, so chars are not copied.
+#
+#   python decoder.py [MB]   benchmarks the decoder on a generated stream (default 32 MB)
+
+import re
+import sys
+import time
+import random
+import collections
+from protocol import cmd_len, cmd_name, CMD_RESET, CMD_RESET2
+
+
+# A command: `code` is the command (high bit masked; 0x1F is reported as CMD_RESET), `args` its argument bytes.
+class Command(collections.namedtuple("Command","code args")) :
+  __slots__ = ()
+
+  @property
+  def name(self) :
+    return cmd_name[self.code]
+
+
+# A run of chars (bytes 0x20..0x7F and 0xA0..0xFF): `data` is a memoryview into the fed chunk (copy it to keep it beyond the next feed).
+# Note that a '.' is a char here; whether the device shows it as a dot depends on DOT-ENABLE/DOT-DISABLE.
+Chars = collections.namedtuple("Chars","data")
+
+
+# A byte that starts a command (lower 7 bits below 0x20)
+_control = re.compile(rb'[\x00-\x1F\x80-\x9F]')
+
+
+# Decodes the stream fed in arbitrary chunks; keeps the state of a command whose arguments are split over chunks.
+class StreamDecoder :
+
+  def __init__(self) :
+    self.code = None       # command collecting arguments (None if none)
+    self.args = bytearray()
+    self.ignored = 0       # control bytes that are not a command (app_cmd_len[] is 0)
+    self.bytecount = 0
+
+  # Decodes `data` (any bytes-like object); returns the list of events (Command and Chars).
+  def feed(self,data) :
+    mv = memoryview(data).cast("B")
+    n = len(mv)
+    self.bytecount += n
+    events = []
+    i = 0
+    if self.code is not None :
+      # Complete the pending command
+      need = cmd_len[self.code]-1-len(self.args)
+      self.args += mv[:need]
+      i = min(need,n)
+      if len(self.args)<cmd_len[self.code]-1 : return events
+      events.append( Command(CMD_RESET if self.code==CMD_RESET2 else self.code,bytes(self.args)) )
+      self.code = None
+      self.args.clear()
+    search = _control.search
+    while i<n :
+      match = search(mv,i)
+      j = match.start() if match else n
+      if j>i : events.append( Chars(mv[i:j]) )
+      if j==n : break
+      code = mv[j] & 0x7F
+      length = cmd_len[code]
+      if length==0 :
+        self.ignored += 1
+        i = j+1
+      elif j+length<=n :
+        events.append( Command(CMD_RESET if code==CMD_RESET2 else code,bytes(mv[j+1:j+length])) )
+        i = j+length
+      else :
+        self.code = code
+        self.args += mv[j+1:n]
+        i = n
+    return events
+
+
+# Returns a stream of about `size` bytes, like a host would send: text, cursor commands, and commands with arguments.
+def sample_stream(size,seed=0) :
+  rnd = random.Random(seed)
+  parts = []
+  total = 0
+  while total<size :
+    kind = rnd.random()
+    if kind<0.6 :
+      part = bytes( rnd.choice(b"0123456789ABCDEFabcdef .-") for _ in range(rnd.randint(1,8)) )
+    elif kind<0.8 :
+      part = bytes([rnd.choice([0x06,0x08,0x09,0x0A,0x0C,0x0D,0x1F])])
+    elif kind<0.95 :
+      part = bytes([0x14]) + bytes( rnd.randrange(256) for _ in range(4) )
+    else :
+      code = rnd.choice([0x01,0x02,0x03,0x04,0x12,0x13])
+      part = bytes([code]) + bytes( rnd.randrange(256) for _ in range(cmd_len[code]-1) )
+    parts.append(part)
+    total += len(part)
+  return b"".join(parts)
+
+
+# Decodes `stream` in chunks of `chunk` bytes; returns (events,MB/s).
+def benchmark(stream,chunk) :
+  decoder = StreamDecoder()
+  events = 0
+  start = time.perf_counter()
+  mv = memoryview(stream)
+  for i in range(0,len(mv),chunk) :
+    events += len(decoder.feed(mv[i:i+chunk]))
+  duration = time.perf_counter()-start
+  return events, len(stream)/duration/1e6
+
+
+# The entry point for command line use: the benchmark
+if __name__ == "__main__":
+  size = int(float(sys.argv[1])*1e6) if len(sys.argv)>1 else 32_000_000
+  stream = sample_stream(1_000_000)*max(1,size//1_000_000)
+  print( f"decoding {len(stream)/1e6:.0f} MB ({len(stream)*10/115200/3600:.1f} hours of one port at 115200 baud)" )
+  for chunk in (1,64,4096,65536) :
+    sample = stream[:1_000_000] if chunk==1 else stream # byte by byte is slow, so only the first MB
+    events,mbps = benchmark(sample,chunk)
+    print( f"  chunks of {chunk:5} bytes: {mbps:7.2f} MB/s ({mbps*1e6/(115200/10):6.0f} ports at line rate), {events} events" )
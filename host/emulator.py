@@ -0,0 +1,387 @@
+# emulator.py - Pure Python emulator of the SSoS firmware (firmware/SSoS/SSoS.ino and drv7s.cpp)
+# The emulator can be served over a pseudo-terminal, so that any pyserial host can run against it unchanged.
+
+import os
+import re
+import time
+import threading
+from protocol import UNITCOUNT, SLOTCOUNT, cmd_len
+from font7s import FONT_LOOKALIKE7S, font_variants, font_translate
+
+
+APP_LONGNAME = "Seven Segment over Serial"
+APP_NAME     = "SSoS"
+APP_VERSION  = "5.6"
+APP_WAIT_MS  = 2000
+APP_STRING_ID_COUNT = 42
+
+
+# A run of plain chars: no commands (lower 7 bits at least 0x20) and, when dot is enabled, no '.'
+_plain_run = [ re.compile(rb'[\x20-\x7F\xA0-\xFF]+'), re.compile(rb'[\x20-\x2D\x2F-\x7F\xA0-\xAD\xAF-\xFF]+') ]
+
+
+# Emulates the state machine of loop()/app_cmd_exec()/app_putpattern() and the state of the drv7s driver.
+# Attributes have the names of the globals in the firmware.
+# Feed it the bytes the host sends with write(); bytes the device sends back are collected for read().
+# Calls to delay() in the firmware are accumulated in `delayed_ms`, and passed to `clock.sleep()` (seconds) if there is a clock.
+# That is `time` when `realtime`, or e.g. a virtual clock (see virtualclock.py).
+class SSoSEmulator :
+
+  # `cc`, `date` and `buildtime` are what the firmware reports for __VERSION__, __DATE__ and __TIME__.
+  def __init__(self,realtime=False,clock=None,cc="7.3.0",date="Jan 29 2022",buildtime="12:00:00") :
+    self.clock = clock if clock else time if realtime else None
+    self.cc = cc
+    self.date = date
+    self.buildtime = buildtime
+    self.delayed_ms = 0           # Total time spent in delay()
+    self.txbuf = bytearray()      # Bytes sent by the device (Serial.print), not yet read by the host
+    # drv7s (static variables are zero initialized)
+    self.drv7s_framebuf = [0]*UNITCOUNT
+    self.drv7s_slot = 0
+    self.drv7s_unit = 0
+    self.drv7s_frame = 0
+    self.drv7s_brightness = 0
+    self.drv7s_alwayshi = 0
+    self.drv7s_framecount = 0
+    self.drv7s_frameshi = 0
+    self.drv7s_noblinkmask = 0
+    self.rows = 0                 # Emulated PORTC/PORTD: segments of the powered unit
+    self.column = None            # Emulated PORTC/PORTD: the powered unit (None if no unit is on)
+    # app
+    self.app_linebuf = [0]*UNITCOUNT
+    self.app_framebuf_backup = [0]*UNITCOUNT
+    self.app_cmd_argv = [0]*5
+    self.app_cmd_argc = 0
+    self.setup()
+
+  ##########################################################
+  # Arduino
+  ##########################################################
+
+  def delay(self,ms) :
+    self.delayed_ms += ms
+    if self.clock : self.clock.sleep(ms/1000)
+
+  def serial_print(self,s) :
+    self.txbuf += s.encode('latin-1')
+
+  def serial_println(self,s="") :
+    self.serial_print(s+"\r\n")
+
+  ##########################################################
+  # drv7s
+  ##########################################################
+
+  def drv7s_reset(self) :
+    self.drv7s_framebuf[:] = [0]*UNITCOUNT
+    self.drv7s_slot = SLOTCOUNT-1
+    self.drv7s_unit = UNITCOUNT-1
+    self.drv7s_frame = (self.drv7s_framecount-1) & 0xFF # Uses the old framecount, like the firmware
+    self.drv7s_brightness = 4
+    self.drv7s_alwayshi = 1
+    self.drv7s_framecount = 0x32
+    self.drv7s_frameshi = 0x19
+    self.drv7s_noblinkmask = 0
+
+  def drv7s_brightness_set(self,val) :
+    self.drv7s_brightness = min(max(val,1),SLOTCOUNT)
+
+  def drv7s_brightness_get(self) :
+    return self.drv7s_brightness
+
+  def drv7s_blinking_mode_set(self,enabled) :
+    self.drv7s_alwayshi = 1 if enabled==0 else 0
+
+  def drv7s_blinking_mode_get(self) :
+    return 1 - self.drv7s_alwayshi
+
+  def drv7s_blinking_hilo_set(self,hi,lo) :
+    hi = min(max(hi,1),254)
+    lo = min(max(lo,1),254)
+    sum = (hi+lo) & 0xFF
+    self.drv7s_framecount = sum if sum>hi else 255
+    self.drv7s_frameshi = hi
+
+  def drv7s_blinking_hi_get(self) :
+    return self.drv7s_frameshi
+
+  def drv7s_blinking_lo_get(self) :
+    return (self.drv7s_framecount - self.drv7s_frameshi) & 0xFF
+
+  def drv7s_blinking_mask_set(self,mask) :
+    self.drv7s_noblinkmask = ~mask & 0xFF
+
+  def drv7s_blinking_mask_get(self) :
+    return ~self.drv7s_noblinkmask & ((1<<UNITCOUNT)-1)
+
+  # One timer tick of ISR(TIMER2_COMPA_vect); the result is in `rows` and `column`.
+  def isr(self) :
+    self.drv7s_slot += 1
+    if self.drv7s_slot >= self.drv7s_brightness :
+      self.column = None
+    if self.drv7s_slot >= SLOTCOUNT :
+      self.drv7s_slot = 0
+      self.drv7s_unit += 1
+      if self.drv7s_unit >= UNITCOUNT :
+        self.drv7s_unit = 0
+        self.drv7s_frame = (self.drv7s_frame+1) & 0xFF
+        if self.drv7s_frame >= self.drv7s_framecount :
+          self.drv7s_frame = 0
+      if self.drv7s_alwayshi or (self.drv7s_noblinkmask & (1<<self.drv7s_unit)) or (self.drv7s_frame < self.drv7s_frameshi) :
+        self.rows = self.drv7s_framebuf[self.drv7s_unit]
+        self.column = self.drv7s_unit
+
+  ##########################################################
+  # app
+  ##########################################################
+
+  def app_reset(self) :
+    self.drv7s_reset()
+    self.app_fontid = FONT_LOOKALIKE7S
+    self.app_cursor = 0
+    self.app_dotenabled = 1
+    self.app_charenabled = 1
+    self.app_chartime20ms = 0x19
+
+  def app_putpattern(self,pattern) :
+    buf = self.drv7s_framebuf if self.app_charenabled else self.app_linebuf
+    if self.app_cursor >= UNITCOUNT :
+      if self.app_charenabled : self.delay(self.app_chartime20ms*20)
+      buf[:-1] = buf[1:]
+      self.app_cursor = UNITCOUNT-1
+    buf[self.app_cursor] = pattern
+    self.app_cursor += 1
+
+  # Equivalent to app_putpattern() for each of `patterns`, but in one go (only when no delay is involved).
+  def app_putpatterns(self,patterns) :
+    buf = self.drv7s_framebuf if self.app_charenabled else self.app_linebuf
+    cursor = self.app_cursor
+    end = cursor+len(patterns)
+    if end <= UNITCOUNT :
+      buf[cursor:end] = patterns
+    else :
+      buf[:] = (bytes(buf[:cursor])+patterns)[-UNITCOUNT:]
+    self.app_cursor = min(end,UNITCOUNT)
+
+  def app_putdot(self) :
+    if self.app_cursor > 0 :
+      buf = self.drv7s_framebuf if self.app_charenabled else self.app_linebuf
+      buf[self.app_cursor-1] |= 0x80
+
+  def app_commit_line(self) :
+    self.drv7s_framebuf[:] = self.app_linebuf
+    self.app_linebuf[:] = [0]*UNITCOUNT
+    self.app_cursor = 0
+
+  def app_clear_home(self) :
+    self.drv7s_framebuf[:] = [0]*UNITCOUNT
+    self.app_linebuf[:] = [0]*UNITCOUNT
+    self.app_cursor = 0
+
+  def app_putchars(self,chars) :
+    font = font_variants[self.app_fontid]
+    chars = chars.encode('latin-1')
+    i = 0
+    j = 0
+    while i<UNITCOUNT and j<len(chars) :
+      ch = chars[j]
+      self.drv7s_framebuf[i] = font[ch & 0x7F] | (ch & 0x80)
+      j += 1
+      if j<len(chars) and chars[j]==ord('.') :
+        self.drv7s_framebuf[i] |= 0x80
+        j += 1
+      i += 1
+    while i<UNITCOUNT :
+      self.drv7s_framebuf[i] = 0
+      i += 1
+
+  def app_slice(self,s,p1,p2,dot=None) :
+    s = s[p1:p2][:UNITCOUNT+1]
+    if dot : s = s.replace(dot,'.')
+    return s
+
+  def app_int(self,val) :
+    return f"0x{val:02X}"
+
+  def app_string(self,id) :
+    strings = [
+      "APP", APP_VERSION,
+      "IDE", "1.8.13",
+      "CC", self.cc,
+      "YEAR", self.app_slice(self.date,7,11),
+      "Mnth", self.app_slice(self.date,0,3),
+      "DAY", self.app_slice(self.date,4,6),
+      "TIME", self.app_slice(self.buildtime,0,6,':'),
+      "BRIT", self.app_int(self.drv7s_brightness_get()),
+      "BL.en", self.app_int(self.drv7s_blinking_mode_get()),
+      "BL.hi", self.app_int(self.drv7s_blinking_hi_get()),
+      "BL.lo", self.app_int(self.drv7s_blinking_lo_get()),
+      "BL.mk", self.app_int(self.drv7s_blinking_mask_get()),
+      "DSP.0", self.app_int(self.app_framebuf_backup[0]),
+      "DSP.1", self.app_int(self.app_framebuf_backup[1]),
+      "DSP.2", self.app_int(self.app_framebuf_backup[2]),
+      "DSP.3", self.app_int(self.app_framebuf_backup[3]),
+      "FONT", self.app_int(self.app_fontid),
+      "CUR", self.app_int(self.app_cursor),
+      "DOT", self.app_int(self.app_dotenabled),
+      "CH.en", self.app_int(self.app_charenabled),
+      "CH.tm", self.app_int(self.app_chartime20ms),
+    ]
+    return strings[id] if id<APP_STRING_ID_COUNT else " N.A."
+
+  def app_show_strings(self,id0,id1) :
+    if id1 > APP_STRING_ID_COUNT : id1 = APP_STRING_ID_COUNT-1
+    self.app_framebuf_backup[:] = self.drv7s_framebuf
+    self.serial_println("Strings")
+    for i in range(0,APP_STRING_ID_COUNT,2) :
+      self.serial_println(f" {self.app_int(i)} {self.app_string(i)} {self.app_string(i+1)}")
+    for id in range(id0,id1+1) :
+      self.app_putchars(self.app_string(id))
+      self.delay(APP_WAIT_MS)
+    self.drv7s_framebuf[:] = self.app_framebuf_backup
+
+  def app_cmd_exec(self,argv) :
+    cmd = argv[0]
+    if   cmd==0x00 : self.app_reset()
+    elif cmd==0x01 : self.app_fontid = argv[1] % 2
+    elif cmd==0x02 : self.drv7s_brightness_set(argv[1] % 16)
+    elif cmd==0x03 : self.drv7s_blinking_mask_set(argv[1] % 16)
+    elif cmd==0x04 : self.drv7s_blinking_hilo_set(argv[1],argv[2])
+    elif cmd==0x05 : self.app_show_strings(argv[1],argv[2])
+    elif cmd==0x06 :
+      if self.app_cursor < UNITCOUNT : self.app_cursor += 1
+    elif cmd==0x07 : self.drv7s_blinking_mode_set(1)
+    elif cmd==0x08 :
+      if self.app_cursor > 0 : self.app_cursor -= 1
+    elif cmd==0x09 : self.app_cursor = UNITCOUNT
+    elif cmd==0x0A :
+      if not self.app_charenabled : self.app_commit_line()
+    elif cmd==0x0B : self.drv7s_blinking_mode_set(0)
+    elif cmd==0x0C : self.app_clear_home()
+    elif cmd==0x0D : self.app_cursor = 0
+    elif cmd==0x0E : self.app_dotenabled = 0
+    elif cmd==0x0F : self.app_dotenabled = 1
+    elif cmd==0x10 : self.app_charenabled = 1
+    elif cmd==0x11 : self.app_charenabled = 0
+    elif cmd==0x12 : self.app_chartime20ms = argv[1]
+    elif cmd==0x13 : self.app_putpattern(argv[1])
+    elif cmd==0x14 : self.drv7s_framebuf[:] = argv[1:1+UNITCOUNT]
+    elif cmd==0x1F : self.app_reset()
+
+  def setup(self) :
+    self.serial_println("\n\n" + APP_LONGNAME + " (" + APP_NAME + ") version " + APP_VERSION)
+    self.app_reset()
+    self.app_putchars("8.8.8.8.")
+    self.delay(500)
+    self.app_putchars(APP_NAME)
+    self.app_cmd_argv[0] = 0
+    self.app_cmd_argc = cmd_len[self.app_cmd_argv[0]]
+
+  # One iteration of loop() with `ch` read from Serial.
+  def loop(self,ch) :
+    ascii = ch & 0x7F
+    argv = self.app_cmd_argv
+    if self.app_cmd_argc < cmd_len[argv[0]] :
+      argv[self.app_cmd_argc] = ch
+      self.app_cmd_argc += 1
+      if self.app_cmd_argc == cmd_len[argv[0]] : self.app_cmd_exec(argv)
+    elif ascii < 0x20 :
+      if cmd_len[ascii] > 0 :
+        argv[0] = ascii
+        self.app_cmd_argc = 1
+        if self.app_cmd_argc == cmd_len[argv[0]] : self.app_cmd_exec(argv)
+    elif ascii==0x2E and self.app_dotenabled :
+      self.app_putdot()
+    else :
+      self.app_putpattern(font_variants[self.app_fontid][ascii] | (ch & 0x80))
+
+  ##########################################################
+  # Host side
+  ##########################################################
+
+  # Processes the bytes `data` sent by the host, as the firmware's loop() would.
+  # Complete commands and runs of plain chars are handled in one go. A run that scrolls in char mode is handled
+  # in one go too when there is no clock (the delays are only accumulated), and char by char otherwise.
+  def write(self,data) :
+    i = 0
+    n = len(data)
+    argv = self.app_cmd_argv
+    while i<n :
+      if self.app_cmd_argc >= cmd_len[argv[0]] :
+        ascii = data[i] & 0x7F
+        if ascii < 0x20 :
+          argc = cmd_len[ascii]
+          if argc > 0 and i+argc <= n :
+            argv[0] = ascii
+            argv[1:argc] = data[i+1:i+argc]
+            self.app_cmd_argc = argc
+            self.app_cmd_exec(argv)
+            i += argc
+            continue
+        else :
+          match = _plain_run[self.app_dotenabled].match(data,i)
+          if match :
+            end = match.end()
+            if not self.app_charenabled or self.app_cursor+end-i <= UNITCOUNT or self.clock is None :
+              if self.app_charenabled : self.delayed_ms += max(0,self.app_cursor+end-i-UNITCOUNT)*self.app_chartime20ms*20
+              self.app_putpatterns(data[i:end].translate(font_translate[self.app_fontid]))
+            else :
+              for ch in data[i:end] : self.loop(ch)
+            i = end
+            continue
+      self.loop(data[i])
+      i += 1
+    return n
+
+  # Returns (and removes) the bytes the device has sent back to the host (at most `size`, like pyserial, if given).
+  def read(self,size=None) :
+    if size is None : size = len(self.txbuf)
+    data = bytes(self.txbuf[:size])
+    del self.txbuf[:size]
+    return data
+
+  # The number of bytes the device has sent back, not yet read (like pyserial).
+  @property
+  def in_waiting(self) :
+    return len(self.txbuf)
+
+  # The current display content (the patterns in drv7s_framebuf).
+  def patterns(self) :
+    return tuple(self.drv7s_framebuf)
+
+
+# Serves `emulator` over a new pseudo-terminal; returns the path of the pty (to be opened by the host).
+# A daemon thread feeds the bytes written by the host to the emulator, and sends back the bytes the emulator prints.
+def serve_pty(emulator) :
+  import tty
+  master,slave = os.openpty()
+  tty.setraw(slave)
+  path = os.ttyname(slave)
+  def pump() :
+    while True :
+      try :
+        data = os.read(master,4096)
+      except OSError :
+        break # slave closed
+      emulator.write(data)
+      out = emulator.read()
+      if out : os.write(master,out)
+  threading.Thread(target=pump,daemon=True).start()
+  os.write(master,emulator.read()) # The boot banner
+  return path
+
+
+# The entry point for command line use: serve an emulator until Ctrl-C
+if __name__ == "__main__":
+  emulator = SSoSEmulator(realtime=True)
+  path = serve_pty(emulator)
+  print( f"SSoS emulator on {path} (Ctrl-C to stop)")
+  try :
+    last = None
+    while True :
+      time.sleep(0.1)
+      if emulator.patterns()!=last :
+        last = emulator.patterns()
+        print( "  display " + " ".join(f"{p:02X}" for p in last) )
+  except KeyboardInterrupt :
+    pass
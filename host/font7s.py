@@ -0,0 +1,275 @@
+# font7s.py - The 7-segment fonts of the SSoS firmware, for use on the host
+# The tables are a copy of firmware/SSoS/font.cpp (and font/tables.py); keep them in sync.
+
+import re
+from protocol import UNITCOUNT
+
+
+# Font IDs (see firmware/SSoS/font.h)
+FONT_LOOKALIKE7S = 0 # ID for  font "LookAlike7s" (every ASCII character maps closest to normal way it looks)
+FONT_UNIQUE7S    = 1 # ID for  font "Unique7s"    (every ASCII character maps to a _unique_ display pattern)
+
+
+font_unique7s = [
+  0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0, # padding for 0x0_
+  0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0, # padding for 0x1_
+  # pgfedcba
+  0b0000_0000, # 20 spc
+  0b0010_1000, # 21 !
+  0b0010_0010, # 22 "
+  0b0110_0011, # 23 #
+  0b0100_1001, # 24 $
+  0b0010_0100, # 25 %
+  0b0111_1110, # 26 &
+  0b0000_0010, # 27 '
+  0b0010_1001, # 28 (
+  0b0000_1011, # 29 )
+  0b0000_0001, # 2A *
+  0b0100_0010, # 2B +
+  0b0000_1100, # 2C ,
+  0b0100_0000, # 2D -
+  0b0001_0000, # 2E .
+  0b0101_0010, # 2F /
+  # pgfe_dcba
+  0b0011_1111, # 30 0
+  0b0000_0110, # 31 1
+  0b0101_1011, # 32 2
+  0b0100_1111, # 33 3
+  0b0110_0110, # 34 4
+  0b0110_1101, # 35 5
+  0b0111_1101, # 36 6
+  0b0000_0111, # 37 7
+  0b0111_1111, # 38 8
+  0b0110_1111, # 39 9
+  0b0000_1001, # 3A :
+  0b0000_1010, # 3B ;
+  0b0010_0001, # 3C <
+  0b0100_1000, # 3D =
+  0b0000_0011, # 3E >
+  0b0100_1011, # 3F ?
+  # pgfe_dcba
+  0b0011_1011, # 40 @
+  0b0111_0111, # 41 A
+  0b0111_1100, # 42 B
+  0b0011_1001, # 43 C
+  0b0001_1111, # 44 D
+  0b0111_1001, # 45 E
+  0b0111_0001, # 46 F
+  0b0011_1101, # 47 G
+  0b0111_0110, # 48 H
+  0b0011_0000, # 49 I
+  0b0001_1110, # 4A J
+  0b0111_0101, # 4B K
+  0b0011_1100, # 4C L
+  0b0101_0101, # 4D M
+  0b0011_0111, # 4E N
+  0b0010_1111, # 4F O
+  # pgfe_dcba
+  0b0111_0011, # 50 P
+  0b0110_1011, # 51 Q
+  0b0011_0011, # 52 R
+  0b0010_1101, # 53 S
+  0b0010_1011, # 54 T
+  0b0011_1110, # 55 U
+  0b0111_0010, # 56 V
+  0b0110_1010, # 57 W
+  0b0011_0110, # 58 X
+  0b0110_1110, # 59 Y
+  0b0001_1011, # 5A Z
+  0b0011_0001, # 5B [
+  0b0110_0100, # 5C \
+  0b0000_1110, # 5D ]
+  0b0010_0011, # 5E ^
+  0b0000_1000, # 5F _
+  # pgfe_dcba
+  0b0010_0000, # 60 `
+  0b0101_1111, # 61 a
+  0b0110_1100, # 62 b
+  0b0101_1000, # 63 c
+  0b0101_1110, # 64 d
+  0b0111_1011, # 65 e
+  0b0101_0001, # 66 f
+  0b0110_0111, # 67 g
+  0b0111_0100, # 68 h
+  0b0000_0101, # 69 i
+  0b0000_1101, # 6A j
+  0b0111_1010, # 6B k
+  0b0011_1000, # 6C l
+  0b0001_0101, # 6D m
+  0b0101_0100, # 6E n
+  0b0101_1100, # 6F o
+  # pgfe_dcba
+  0b0101_0011, # 70 p
+  0b0110_0101, # 71 q
+  0b0101_0000, # 72 r
+  0b0010_0101, # 73 s
+  0b0111_1000, # 74 t
+  0b0001_1100, # 75 u
+  0b0011_0010, # 76 v
+  0b0010_1010, # 77 w
+  0b0001_0100, # 78 x
+  0b0010_1110, # 79 y
+  0b0001_0011, # 7A z
+  0b0100_0110, # 7B {
+  0b0000_0100, # 7C |
+  0b0111_0000, # 7D }
+  0b0100_0001, # 7E ~
+  0b0101_1101  # 7F del
+]
+
+
+font_lookalike7s = [
+  0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0, # padding for 0x0_
+  0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0, # padding for 0x1_
+  # pgfedcba
+  0b0000_0000, # 20 spc
+  0b0010_1000, # 21 !
+  0b0010_0010, # 22 "
+  0b0110_0011, # 23 #
+  0b0100_1001, # 24 $
+  0b0010_0100, # 25 %
+  0b0111_1110, # 26 &
+  0b0000_0010, # 27 '
+  0b0011_1001, # 28 (
+  0b0000_1111, # 29 )
+  0b0000_0001, # 2A *
+  0b0100_0010, # 2B +
+  0b0000_1100, # 2C ,
+  0b0100_0000, # 2D -
+  0b0001_0000, # 2E .
+  0b0101_0010, # 2F /
+  # pgfe_dcba
+  0b0011_1111, # 30 0
+  0b0000_0110, # 31 1
+  0b0101_1011, # 32 2
+  0b0100_1111, # 33 3
+  0b0110_0110, # 34 4
+  0b0110_1101, # 35 5
+  0b0111_1101, # 36 6
+  0b0000_0111, # 37 7
+  0b0111_1111, # 38 8
+  0b0110_1111, # 39 9
+  0b0000_1001, # 3A :
+  0b0000_1010, # 3B ;
+  0b0101_1000, # 3C <
+  0b0100_1000, # 3D =
+  0b0100_1100, # 3E >
+  0b0100_1011, # 3F ?
+  # pgfe_dcba
+  0b0011_1011, # 40 @
+  0b0111_0111, # 41 A
+  0b0111_1100, # 42 B
+  0b0011_1001, # 43 C
+  0b0101_1110, # 44 D
+  0b0111_1001, # 45 E
+  0b0111_0001, # 46 F
+  0b0011_1101, # 47 G
+  0b0111_0110, # 48 H
+  0b0011_0000, # 49 I
+  0b0001_1110, # 4A J
+  0b0111_0101, # 4B K
+  0b0011_1100, # 4C L
+  0b0101_0101, # 4D M
+  0b0011_0111, # 4E N
+  0b0011_1111, # 4F O
+  # pgfe_dcba
+  0b0111_0011, # 50 P
+  0b0110_1011, # 51 Q
+  0b0011_0011, # 52 R
+  0b0110_1101, # 53 S
+  0b0111_1000, # 54 T
+  0b0011_1110, # 55 U
+  0b0111_0010, # 56 V
+  0b0110_1010, # 57 W
+  0b0011_0110, # 58 X
+  0b0110_1110, # 59 Y
+  0b0101_1011, # 5A Z
+  0b0011_1001, # 5B [
+  0b0110_0100, # 5C \
+  0b0000_1111, # 5D ]
+  0b0010_0011, # 5E ^
+  0b0000_1000, # 5F _
+  # pgfe_dcba
+  0b0010_0000, # 60 `
+  0b0101_1111, # 61 a
+  0b0111_1100, # 62 b
+  0b0101_1000, # 63 c
+  0b0101_1110, # 64 d
+  0b0111_1011, # 65 e
+  0b0111_0001, # 66 f
+  0b0110_1111, # 67 g
+  0b0111_0100, # 68 h
+  0b0000_0101, # 69 i
+  0b0000_1101, # 6A j
+  0b0111_0101, # 6B k
+  0b0011_1000, # 6C l
+  0b0101_0101, # 6D m
+  0b0101_0100, # 6E n
+  0b0101_1100, # 6F o
+  # pgfe_dcba
+  0b0111_0011, # 70 p
+  0b0110_0111, # 71 q
+  0b0101_0000, # 72 r
+  0b0110_1101, # 73 s
+  0b0111_1000, # 74 t
+  0b0001_1100, # 75 u
+  0b0111_0010, # 76 v
+  0b0110_1010, # 77 w
+  0b0001_0100, # 78 x
+  0b0010_1110, # 79 y
+  0b0101_1011, # 7A z
+  0b0100_0110, # 7B {
+  0b0000_0110, # 7C |
+  0b0111_0000, # 7D }
+  0b0100_0001, # 7E ~
+  0b0101_1101  # 7F del
+]
+
+
+# Indexed by font ID
+font_variants = [ font_lookalike7s, font_unique7s ]
+
+
+# Returns the pattern the firmware shows for character `ch` (an int) in font `fontid`, like font_get() in font.cpp.
+# For the upper half of the characters (0x80 and up), the dot of the 7-segment is added.
+def font_get(fontid,ch) :
+  return font_variants[fontid][ch & 0x7F] | (ch & 0x80)
+
+
+# Indexed by font ID: a bytes.translate() table mapping every char (0..255) to its pattern, so font_translate[fontid][ch]==font_get(fontid,ch).
+font_translate = [ bytes( font[ch & 0x7F] | (ch & 0x80) for ch in range(256) ) for font in font_variants ]
+
+# A char followed by a '.'; app_putchars() shows the pair as the char with its dot lit (a leading '.' is a char).
+_dotted = re.compile(rb'(.)\.',re.DOTALL)
+
+# The char with the dot added; since font_get(fontid,ch|0x80)==font_get(fontid,ch)|0x80, folding is done on the chars.
+_fold = [ bytes([ch|0x80]) for ch in range(256) ]
+
+
+# Converts `text` (str or bytes) to pattern bytes in font `fontid`, with two passes in C: fold the dots, then bytes.translate().
+# With `dots`, a '.' after a char lights the dot of that char (as app_putchars() does), otherwise a '.' is a char (the font's pattern).
+# With `width`, the patterns are clipped or padded with blanks to `width` units (as app_putchars() does with UNITCOUNT).
+def encode_text(text,fontid=FONT_LOOKALIKE7S,width=None,dots=True) :
+  if isinstance(text,str) : text = text.encode('latin-1')
+  if dots and b'.' in text : text = _dotted.sub(lambda match: _fold[match.group(1)[0]],text)
+  patterns = text.translate(font_translate[fontid])
+  if width is None : return patterns
+  return patterns[:width].ljust(width,b'\0')
+
+
+# Like _dotted, for texts joined with '\n': a '.' after the separator is the first char of the next text, not a dot.
+_dotted_joined = re.compile(rb'([^\n])\.')
+
+
+# Converts a batch of `texts` to a list of pattern bytes of `width` units each; see encode_text().
+# The batch is encoded in one pass: the texts are joined, folded, split, clipped and padded, and translated at once.
+# Concatenate the result (b''.join) to get the payloads of consecutive PATTERN-ALL commands.
+def encode_texts(texts,fontid=FONT_LOOKALIKE7S,width=UNITCOUNT,dots=True) :
+  texts = [ text.encode('latin-1') if isinstance(text,str) else text for text in texts ]
+  joined = b'\n'.join(texts)
+  if joined.count(b'\n')!=len(texts)-1 : # a text has a '\n' itself
+    return [ encode_text(text,fontid,width,dots) for text in texts ]
+  if dots and b'.' in joined : joined = _dotted_joined.sub(lambda match: _fold[match.group(1)[0]],joined)
+  # Padded with ' ' before the translation: a blank in both fonts
+  patterns = b''.join( text[:width].ljust(width) for text in joined.split(b'\n') ).translate(font_translate[fontid])
+  return [ patterns[i:i+width] for i in range(0,len(patterns),width) ]
@@ -0,0 +1,116 @@
+# introspect.py - Reads the state and firmware version of an SSoS device, via the serial dump of SHOW-STRINGS
+# SHOW-STRINGS prints all strings (APP version, compiler, build date, BRIT, BL.*, DSP.*, FONT, CUR, DOT, CH.*) over serial,
+# and then shows the strings id0..id1 on the display, each for APP_WAIT_MS (2 s). With an empty range (id0>id1) only the
+# dump is done, which takes ~40 ms (~470 bytes at 115200 baud), and the display does not change.
+# This module sends that, reads and parses the dump, and returns a snapshot.
+#
+#   python introspect.py PORT ...     prints the snapshot of the devices on the ports (queried in parallel)
+#   python introspect.py --emulator   idem, for an emulator
+
+import re
+import sys
+import time
+import collections
+import concurrent.futures
+from protocol import UNITCOUNT, CMD_SHOW_STRINGS
+
+
+# SHOW-STRINGS with an empty range (id0>id1): only the dump, the display does not change.
+QUERY = bytes([CMD_SHOW_STRINGS,0x01,0x00])
+QUERY_LINES = 22 # "Strings" and 21 lines with two strings each
+
+# A line of the dump: " 0x0E BRIT 0x04" is id 0x0E (the name) and id 0x0F (the value)
+_line = re.compile(r'^ 0x([0-9A-Fa-f]+) (\S*) (.*)$')
+
+
+# The snapshot of a device; `strings` has all strings of the dump by id.
+DeviceInfo = collections.namedtuple("DeviceInfo","version ide cc date time brightness blinkenabled blinkhi blinklo blinkmask "
+                                                 "display fontid cursor dotenabled charenabled chartime strings")
+
+
+# Parses the lines (str or bytes, with or without line ends) of a dump; returns a DeviceInfo.
+# Raises ValueError when the lines are not a (complete) dump.
+def parse_strings(lines) :
+  lines = [ (line.decode("latin-1") if isinstance(line,bytes) else line).rstrip("\r\n") for line in lines ]
+  if not lines or lines[0]!="Strings" : raise ValueError("not a SHOW-STRINGS dump")
+  strings = {}
+  for line in lines[1:] :
+    match = _line.match(line)
+    if not match : raise ValueError(f"bad line in SHOW-STRINGS dump: {line!r}")
+    id = int(match.group(1),16)
+    strings[id] = match.group(2)
+    strings[id+1] = match.group(3)
+  values = { strings[id]:strings.get(id+1) for id in range(0,len(strings),2) }
+  try :
+    number = lambda name : int(values[name],16)
+    return DeviceInfo(
+      version=values["APP"], ide=values["IDE"], cc=values["CC"],
+      date=f"{values['Mnth']} {values['DAY']} {values['YEAR']}", time=values["TIME"].rstrip(".").replace(".",":"),
+      brightness=number("BRIT"), blinkenabled=number("BL.en"), blinkhi=number("BL.hi"), blinklo=number("BL.lo"),
+      blinkmask=number("BL.mk"), display=tuple(number(f"DSP.{i}") for i in range(UNITCOUNT)),
+      fontid=number("FONT"), cursor=number("CUR"), dotenabled=number("DOT"), charenabled=number("CH.en"), chartime=number("CH.tm"),
+      strings=strings )
+  except (KeyError,TypeError) as error :
+    raise ValueError(f"incomplete SHOW-STRINGS dump: {error}") from None
+
+
+# Sends the query to `ser` (a serial port, a VirtualSerial, an SSoSEmulator: anything with write(), read(size) and in_waiting),
+# and reads the dump; returns a DeviceInfo. Bytes that were waiting (e.g. the boot banner) are skipped.
+# Raises TimeoutError when the dump is not complete within `timeout` seconds, ValueError when it is garbled.
+def query(ser,timeout=1.0,clock=time) :
+  if hasattr(ser,"reset_input_buffer") : ser.reset_input_buffer()
+  elif ser.in_waiting : ser.read(ser.in_waiting)
+  ser.write(QUERY)
+  deadline = clock.monotonic()+timeout
+  data = bytearray()
+  while True :
+    data += ser.read(max(1,ser.in_waiting))
+    start = data.find(b"Strings\r\n")
+    if start<0 : start = data.find(b"Strings\n")
+    if start>=0 and data.count(b"\n",start)>=QUERY_LINES :
+      lines = bytes(data[start:]).split(b"\n")[:QUERY_LINES]
+      return parse_strings(lines)
+    if clock.monotonic()>=deadline : raise TimeoutError(f"no SHOW-STRINGS dump within {timeout} s")
+    if not ser.in_waiting : clock.sleep(0.001)
+
+
+# Queries the devices on `ports` in parallel (each opened without resetting the board); returns {port: DeviceInfo or exception}.
+def audit(ports,timeout=1.0) :
+  from pool import open_port
+  def one(port) :
+    try :
+      ser = open_port(port,timeout=0.01)
+      try :
+        return query(ser,timeout)
+      finally :
+        ser.close()
+    except (OSError,TimeoutError,ValueError) as error :
+      return error
+  with concurrent.futures.ThreadPoolExecutor(max(1,len(ports))) as executor :
+    return dict(zip(ports,executor.map(one,ports)))
+
+
+# Returns a one line summary of `info` (a DeviceInfo, or an exception).
+def summary(info) :
+  if isinstance(info,Exception) : return f"error: {info}"
+  display = " ".join(f"{p:02X}" for p in info.display)
+  return ( f"SSoS {info.version} ({info.date} {info.time}, cc {info.cc}), display {display}, brightness {info.brightness}, "
+           f"blink {'on' if info.blinkenabled else 'off'} {info.blinkhi}/{info.blinklo} mask {info.blinkmask:X}, "
+           f"font {info.fontid}, cursor {info.cursor}, dot {info.dotenabled}, char {info.charenabled}, chartime {info.chartime}" )
+
+
+# The entry point for command line use
+if __name__ == "__main__":
+  if len(sys.argv)<2 or sys.argv[1]=="--emulator" :
+    from emulator import SSoSEmulator
+    emulator = SSoSEmulator()
+    emulator.write(b"\x02\x03Hi.")
+    start = time.perf_counter()
+    info = query(emulator)
+    print( f"emulator: {summary(info)} ({(time.perf_counter()-start)*1000:.1f} ms)" )
+  else :
+    start = time.perf_counter()
+    results = audit(sys.argv[1:])
+    for port,info in results.items() :
+      print( f"{port}: {summary(info)}" )
+    print( f"audited {len(results)} devices in {time.perf_counter()-start:.3f} s" )
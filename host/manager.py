@@ -0,0 +1,208 @@
+# manager.py - Drives many SSoS devices from one asyncio event loop
+# Every device has a latest-wins slot: a new frame replaces the frame that is still waiting, so a slow device skips frames instead of lagging.
+# The (blocking) serial writes run in a thread per device, so a slow or stalled port does not delay the others.
+
+import os
+import sys
+import time
+import asyncio
+import concurrent.futures
+from protocol import BAUDRATE
+from ssos import SSoS
+from stats import WriteMeter, prometheus
+from pool import open_port
+
+
+# Counters of one device, to monitor backpressure.
+class DeviceStats :
+
+  def __init__(self) :
+    self.submitted   = 0     # frames submitted
+    self.coalesced   = 0     # frames replaced by a newer frame before they were sent
+    self.sent        = 0     # frames sent
+    self.bytes       = 0     # bytes written (including RESETs)
+    self.errors      = 0     # failed writes (and frames the client rejected)
+    self.last_error  = None  # the last error (repr), None if none
+    self.busy        = False # a write is in progress
+    self.wait_s      = 0.0   # time the last sent frame waited in the slot
+    self.write_s     = 0.0   # duration of the last write
+    self.max_write_s = 0.0   # longest write
+
+  def as_dict(self) :
+    return dict(vars(self))
+
+
+# One device: the serial port, the client that mirrors its state, the latest-wins slot, and the task and thread that write.
+class Device :
+
+  def __init__(self,name,ser,reset=True) :
+    self.name = name
+    self.ser = ser
+    self.meter = WriteMeter(ser,name) # the client writes via the meter
+    self.ssos = None # created by the writer thread, since SSoS() sends a RESET
+    self.stats = DeviceStats()
+    self._reset = reset
+    self._resync = False # a write failed, so the mirror is not trusted
+    self._closed = False
+    self._frame = None   # the waiting frame: (SSoS method name, argument, submit time)
+    self._ready = asyncio.Event()
+    self._idle = asyncio.Event()
+    self._idle.set()
+    self._executor = concurrent.futures.ThreadPoolExecutor(1,thread_name_prefix=f"ssos-{name}")
+    self._task = asyncio.get_running_loop().create_task(self._run())
+
+  # True when a frame waits to be sent.
+  @property
+  def pending(self) :
+    return self._frame is not None
+
+  # Puts a frame in the slot (replacing a waiting frame); never blocks.
+  def put(self,method,arg) :
+    if self._frame is not None : self.stats.coalesced += 1
+    self._frame = (method,arg,time.monotonic())
+    self.stats.submitted += 1
+    self._idle.clear()
+    self._ready.set()
+
+  # The port of the client: writes via the meter, and fails once the device is closed (so no write follows a cancelled one).
+  def write(self,data) :
+    if self._closed : raise OSError(f"device {self.name} is closed")
+    return self.meter.write(data)
+
+  # Sends a frame with the client; runs in the thread of the device. Returns the number of bytes written.
+  def _send(self,method,arg) :
+    if self.ssos is None :
+      self.ssos = SSoS(self,self._reset)
+    elif self._resync :
+      self.ssos.invalidate()
+    self._resync = False
+    bytecount = self.ssos.bytecount
+    getattr(self.ssos,method)(arg)
+    return self.ssos.bytecount-bytecount
+
+  async def _run(self) :
+    loop = asyncio.get_running_loop()
+    while True :
+      await self._ready.wait()
+      self._ready.clear()
+      if self._frame is None : continue
+      method,arg,submitted = self._frame
+      self._frame = None
+      self.stats.busy = True
+      start = time.monotonic()
+      self.stats.wait_s = start-submitted
+      self.meter.observe_wait(self.stats.wait_s)
+      try :
+        self.stats.bytes += await loop.run_in_executor(self._executor,self._send,method,arg)
+        self.stats.sent += 1
+      except Exception as error : # OSError (also serial.SerialException and serial.SerialTimeoutException), or bad input (e.g. a text that is not latin-1)
+        self.stats.errors += 1
+        self.stats.last_error = repr(error)
+        self._resync = True
+      self.stats.busy = False
+      self.stats.write_s = time.monotonic()-start
+      self.stats.max_write_s = max(self.stats.max_write_s,self.stats.write_s)
+      if self._frame is None : self._idle.set()
+
+  # Waits until the slot is empty and no write is in progress.
+  async def drain(self) :
+    await self._idle.wait()
+
+  # Stops the writer. A write in progress on a stalled port is cancelled (pyserial ports), so its thread ends
+  # and does not block the exit of the interpreter (which joins the threads of executors); it is not waited for.
+  def close(self) :
+    self._closed = True
+    self._task.cancel()
+    if self.stats.busy and hasattr(self.ser,"cancel_write") : self.ser.cancel_write()
+    self._executor.shutdown(wait=False)
+
+
+# Owns the devices (by name) and their ports; all methods must be called from the event loop.
+class SSoSManager :
+
+  def __init__(self) :
+    self.devices = {}
+    self._owned = [] # ports opened by open(), closed by close()
+
+  # Adds a device on an opened serial port `ser` (anything with write(), e.g. a VirtualSerial). See SSoS for `reset`.
+  def add(self,name,ser,reset=True) :
+    assert name not in self.devices
+    self.devices[name] = Device(name,ser,reset)
+    return self.devices[name]
+
+  # Opens `port` (a serial port, or the path of a pty) without resetting the board, and adds it as device `name`.
+  # With a `write_timeout` (seconds), a write to a stalled port fails (and counts as error) instead of blocking its thread;
+  # with None it blocks until the port drains (close() then cancels the write).
+  async def open(self,name,port,baudrate=BAUDRATE,write_timeout=1.0) :
+    ser = await asyncio.get_running_loop().run_in_executor(None,lambda : open_port(port,baudrate,None,write_timeout))
+    self._owned.append(ser)
+    return self.add(name,ser)
+
+  # Shows `text` on device `name` (as SSoS.show); latest wins, never blocks.
+  def show(self,name,text) :
+    self.devices[name].put("show",text)
+
+  # Shows `patterns` on device `name` (as SSoS.show_patterns); latest wins, never blocks.
+  def show_patterns(self,name,patterns) :
+    self.devices[name].put("show_patterns",tuple(patterns))
+
+  # Shows `text` on all devices.
+  def show_all(self,text) :
+    for device in self.devices.values() :
+      device.put("show",text)
+
+  # Waits until all devices have sent their waiting frames.
+  async def drain(self) :
+    await asyncio.gather( *(device.drain() for device in self.devices.values()) )
+
+  # Returns the counters of all devices, by name.
+  def metrics(self) :
+    return { name:device.stats.as_dict() for name,device in self.devices.items() }
+
+  # Returns the write meters of all devices (bytes per command, write and wait histograms; see stats.py) in the Prometheus text format.
+  def prometheus(self) :
+    return prometheus( [ device.meter for device in self.devices.values() ] )
+
+  # Stops all writers and closes the ports opened by open().
+  def close(self) :
+    for device in self.devices.values() :
+      device.close()
+    for ser in self._owned :
+      ser.close()
+    self.devices.clear()
+    self._owned.clear()
+
+
+# Demo: drives `count` emulators (on ptys) with a counter, as fast as possible for a few seconds.
+# The last device is a pty that nobody reads, so its writes stall; the other devices keep up.
+async def demo(count=40,seconds=2.0) :
+  from emulator import SSoSEmulator, serve_pty
+  manager = SSoSManager()
+  emulators = [ SSoSEmulator() for _ in range(count-1) ]
+  for i,emulator in enumerate(emulators) :
+    await manager.open(f"dev{i}",serve_pty(emulator))
+  master,slave = os.openpty() # the stalled device: nobody reads, and the pty buffer is filled up front
+  await manager.open("stalled",os.ttyname(slave))
+  os.set_blocking(slave,False)
+  try :
+    while True : os.write(slave,bytes(4096))
+  except BlockingIOError :
+    pass
+  start = time.monotonic()
+  frame = 0
+  while time.monotonic()-start<seconds :
+    manager.show_all(f"{frame%10000:4d}")
+    frame += 1
+    await asyncio.sleep(0.001)
+  await asyncio.wait_for( asyncio.gather( *(manager.devices[f"dev{i}"].drain() for i in range(count-1)) ), 5 )
+  for name,stats in manager.metrics().items() :
+    print( f"{name:8} submitted {stats['submitted']:5} sent {stats['sent']:5} coalesced {stats['coalesced']:5} bytes {stats['bytes']:6} errors {stats['errors']} busy {stats['busy']!s:5} max write {stats['max_write_s']*1000:7.3f} ms" )
+  shown = sum( emulator.patterns()==manager.devices["dev0"].ssos.framebuf for emulator in emulators )
+  print( f"{frame} frames in {seconds} s; {shown} of {len(emulators)} emulators show the last frame" )
+  manager.close()
+  os.close(master)
+
+
+# The entry point for command line use: the demo, with the number of devices as optional argument
+if __name__ == "__main__":
+  asyncio.run( demo(int(sys.argv[1]) if len(sys.argv)>1 else 40) )
@@ -0,0 +1,75 @@
+# marquee.py - Scrolls long text on the host: precomputed frames, sent as PATTERN-ALL at a frame rate of the host
+# Text longer than the display scrolls on the device in char mode, but app_putpattern() then calls delay(CHAR-TIME*20ms)
+# for every scrolled char: loop() does not read serial in that time (other commands wait, the RX buffer fills up),
+# and the speed can only be set in steps of 20 ms. The marquee computes all frames of a text once (dots folded,
+# padded or wrapped), caches them per text and font, and the scheduler (schedule.py) sends them at the deadline of every frame.
+# The device only sees PATTERN-ALL commands, so it stays responsive.
+#
+#   python marquee.py   compares device scrolling with the marquee, on virtual time
+
+import functools
+from protocol import UNITCOUNT, CMD_PATTERN_ALL
+from font7s import FONT_LOOKALIKE7S, encode_text
+from schedule import Scheduler, frame_updates
+
+
+# Returns the frames (a tuple of bytes of `width` patterns) that scroll `text` (str or bytes, '.' lights the dot of the char before it).
+# Without `wrap`, the text scrolls in from the right on a blank display and scrolls out to the left (as device scrolling does,
+# plus the scroll out). With `wrap` the frames are one cycle of an endless loop, with `gap` blanks between the end and the start.
+# Text that fits is one frame (left aligned, as app_putchars() shows it). Cached per text, font and layout.
+@functools.lru_cache(maxsize=256)
+def marquee_frames(text,fontid=FONT_LOOKALIKE7S,wrap=False,gap=1,width=UNITCOUNT) :
+  patterns = encode_text(text,fontid)
+  if len(patterns)<=width : return ( patterns.ljust(width,b'\0'), )
+  if wrap :
+    cycle = patterns + b'\0'*gap
+    strip = cycle + cycle[:width-1]
+    return tuple( strip[i:i+width] for i in range(len(cycle)) )
+  strip = b'\0'*width + patterns + b'\0'*width
+  return tuple( strip[i:i+width] for i in range(1,len(strip)-width+1) )
+
+
+# Returns the PATTERN-ALL commands of marquee_frames() (same arguments); cached as well.
+@functools.lru_cache(maxsize=256)
+def marquee_payloads(text,fontid=FONT_LOOKALIKE7S,wrap=False,gap=1,width=UNITCOUNT) :
+  return tuple( bytes([CMD_PATTERN_ALL])+frame for frame in marquee_frames(text,fontid,wrap,gap,width) )
+
+
+# Returns the updates (for Scheduler.play) that scroll `text` on serial port `ser` at `fps` frames per second;
+# with `wrap`, `cycles` times. Merge them with other updates (sorted by offset) to interleave other commands.
+def marquee_updates(ser,text,fps=5.0,fontid=FONT_LOOKALIKE7S,wrap=False,cycles=1) :
+  payloads = marquee_payloads(text,fontid,wrap)
+  return frame_updates(ser,payloads*(cycles if wrap else 1),1/fps)
+
+
+# Scrolls `text` on the SSoS client `ssos` at `fps` frames per second (blocks until done; with `wrap`, `cycles` times).
+# The frames go via the client, so its mirror stays in sync (and a frame may cost less than PATTERN-ALL).
+# Returns the Lateness of the frames.
+def marquee(ssos,text,fps=5.0,wrap=False,cycles=1,scheduler=None) :
+  frames = marquee_frames(text,ssos.fontid,wrap)*(cycles if wrap else 1)
+  if scheduler is None : scheduler = Scheduler()
+  return scheduler.play( [ (k/fps, lambda frame=frame : ssos.show_patterns(frame)) for k,frame in enumerate(frames) ] )
+
+
+# The entry point for command line use: how long a command waits while text scrolls, on the device and with the marquee
+if __name__ == "__main__":
+  from protocol import CMD_SET_BRIGHTNESS, CMD_CHAR_TIME
+  from virtualclock import VirtualClock, VirtualSerial
+  text = "Seven Segment over Serial"
+  fps = 1000/120 # CHAR-TIME 6 (6*20 ms)
+
+  clock = VirtualClock()
+  ser = VirtualSerial(clock)
+  ser.write( bytes([CMD_CHAR_TIME,6,0x0C]) + text.encode() )
+  clock.sleep(1.0)
+  ser.write( bytes([CMD_SET_BRIGHTNESS,2]) )
+  print( f"device scrolling: SET-BRIGHTNESS sent at 1.000 s is executed at {ser.device_now:.3f} s" )
+
+  clock = VirtualClock()
+  ser = VirtualSerial(clock)
+  updates = marquee_updates(ser,text,fps) + [ (1.0, lambda : ser.write(bytes([CMD_SET_BRIGHTNESS,2]))) ]
+  executed = []
+  updates.append( (1.0+1e-9, lambda : executed.append(ser.device_now)) )
+  stats = Scheduler(clock).play( sorted(updates,key=lambda update : update[0]) )
+  print( f"marquee         : SET-BRIGHTNESS sent at 1.000 s is executed at {executed[0]:.3f} s" )
+  print( f"marquee         : {len(marquee_frames(text))} frames at {fps:.2f} fps, {stats}" )
@@ -0,0 +1,126 @@
+# numeric.py - Renders numbers for the 4-unit display (fixed, float, signed, hex), with an LRU cache of the patterns and payloads
+# The LEGO demos show numbers with `str(i/10)`: every update is formatted, encoded and dot-merged on the fly.
+# A NumericFormat does that once per value: the result (patterns, and the PATTERN-ALL payload) is kept in an LRU cache,
+# so a counter or telemetry value that repeats costs one dict lookup. Misses are encoded in C with the font's translate table.
+#
+#   python numeric.py   shows some formats, and measures the cost per update
+
+import math
+import time
+import functools
+from protocol import UNITCOUNT, CMD_PATTERN_ALL
+from font7s import FONT_LOOKALIKE7S, font_translate
+
+
+FIXED  = "fixed"  # a fixed number of decimals, e.g. 12.5 with decimals=2 is "12.50"
+FLOAT  = "float"  # as many decimals as fit, e.g. 3.14159 is "3.142", 1234.6 is "1235" (at least one decimal when that fits, like str())
+SIGNED = "signed" # an integer (rounded), "-" for negative numbers, e.g. -42 is " -42"
+HEX    = "hex"    # an integer (rounded, not negative) in hexadecimal, e.g. 48879 is "bEEF"
+
+LEFT  = "left"  # like "\f12" (CLEAR-AND-HOME and chars)
+RIGHT = "right" # like "\t12\n" in line mode (CURSOR-EOLN scrolls the chars in from the right)
+
+OVERFLOW  = (0b0000_0001,)*UNITCOUNT # segment a on all units: the number is too big (or +inf)
+UNDERFLOW = (0b0000_1000,)*UNITCOUNT # segment d on all units: the number is too negative (or -inf, or negative for HEX)
+NOTANUMBER = (0b0100_0000,)*UNITCOUNT # segment g on all units: NaN
+
+# Upper case hex digits B and D look like 8 and 0; the lower case ones are unambiguous (in both fonts)
+_hexdigits = str.maketrans("BD","bd")
+
+
+# Renders numbers of one format; the cache is per format, so use one NumericFormat per kind of value (e.g. per telemetry feed).
+# `kind` is FIXED, FLOAT, SIGNED or HEX, `decimals` is for FIXED, `align` is LEFT or RIGHT, `fontid` the font of the device.
+# `width` is the number of units; numbers that do not fit show `overflow` (too big) or `underflow` (too negative).
+# `cache` is the number of values kept in the LRU caches (None for unbounded).
+class NumericFormat :
+
+  def __init__(self,kind=FIXED,decimals=1,align=RIGHT,fontid=FONT_LOOKALIKE7S,width=UNITCOUNT,overflow=OVERFLOW,underflow=UNDERFLOW,cache=1024) :
+    assert kind in (FIXED,FLOAT,SIGNED,HEX)
+    assert align in (LEFT,RIGHT)
+    assert 0<=decimals<width
+    self.kind = kind
+    self.decimals = decimals
+    self.align = align
+    self.width = width
+    self.overflow = tuple(overflow)[:width]
+    self.underflow = tuple(underflow)[:width]
+    self.table = font_translate[fontid]
+    # The caches: patterns(value) and payload(value) are one dict lookup for a value seen before
+    self.patterns = functools.lru_cache(maxsize=cache)(self._patterns)
+    self.payload = functools.lru_cache(maxsize=cache)(self._payload)
+
+  # Returns the text for `value` (with '.' for the dot), or None if it does not fit.
+  def text(self,value) :
+    if not math.isfinite(value) : return None
+    width = self.width
+    if self.kind==FIXED :
+      text = f"{value:.{self.decimals}f}"
+    elif self.kind==FLOAT :
+      # The most decimals that fit: the digits (and sign) before the dot take the other units
+      whole = len(f"{value:.0f}")
+      if whole>width : return None
+      for decimals in range(width-whole,-1,-1) :
+        text = f"{value:.{decimals}f}"
+        if len(text)-text.count(".")<=width : break # rounding may add a digit (e.g. 9.9999 is "10.000")
+      if "." in text :
+        text = text.rstrip("0")
+        if text.endswith(".") : text += "0" # at least one decimal, like str()
+    elif self.kind==SIGNED :
+      text = str(round(value))
+    else :
+      if round(value)<0 : return None
+      text = format(round(value),"X").translate(_hexdigits)
+    if text.startswith("-") and text.strip("-0.")=="" : text = text[1:] # no "-0.0"
+    return text if len(text)-text.count(".")<=width else None
+
+  # Returns the UNITCOUNT patterns (tuple) for `value`, uncached; use patterns().
+  def _patterns(self,value) :
+    if value!=value : return NOTANUMBER[:self.width]
+    if value in (math.inf,-math.inf) : return self.overflow if value>0 else self.underflow
+    text = self.text(value)
+    if text is None : return self.overflow if value>=0 else self.underflow
+    data = text.encode("ascii")
+    if b"." in data :
+      # The dot lights the dot of the digit before it (as app_putchars() does): the digit gets the high bit
+      dot = data.index(b".")
+      data = data[:dot-1] + bytes([data[dot-1] | 0x80]) + data[dot+1:]
+    data = data.translate(self.table)
+    data = data.rjust(self.width,b"\0") if self.align==RIGHT else data.ljust(self.width,b"\0")
+    return tuple(data)
+
+  # Returns the PATTERN-ALL command that shows `value`, uncached; use payload().
+  def _payload(self,value) :
+    return bytes([CMD_PATTERN_ALL]) + bytes(self.patterns(value))
+
+  # Returns the hit ratios of the caches of patterns() and payload() (e.g. for a dashboard).
+  def hit_ratios(self) :
+    ratios = []
+    for info in (self.patterns.cache_info(),self.payload.cache_info()) :
+      calls = info.hits+info.misses
+      ratios.append( info.hits/calls if calls else 0.0 )
+    return tuple(ratios)
+
+
+# The entry point for command line use: examples, and the cost per update of str() + encode versus the cache
+if __name__ == "__main__":
+  from font7s import encode_text
+  examples = [ (NumericFormat(FIXED,1),[0,3.14159,-2.25,999.94,-99.95,1000,-1000]),
+               (NumericFormat(FIXED,2,LEFT),[3.14159,12.5,-0.001]),
+               (NumericFormat(FLOAT),[3.14159,-3.14159,1.0,12.5,1234.6,9.99999,12345]),
+               (NumericFormat(SIGNED),[42,-42,9999,-999,-1000]),
+               (NumericFormat(HEX),[0xBEEF,0xFFFF,0x10000,-1]),
+               (NumericFormat(FLOAT),[math.nan,math.inf]) ]
+  for fmt,values in examples :
+    for value in values :
+      print( f"{fmt.kind:6} {fmt.align:5} {value!r:>10} -> {fmt.text(value)!r:9} " + " ".join(f"{p:02X}" for p in fmt.patterns(value)) )
+  # A 10 Hz counter that repeats every 100 s (1000 values), like the LEGO numbers demo
+  values = [ (i%1000)/10 for i in range(100_000) ]
+  start = time.perf_counter()
+  for value in values : payload = bytes([CMD_PATTERN_ALL]) + encode_text(str(value),FONT_LOOKALIKE7S,UNITCOUNT)
+  plain = (time.perf_counter()-start)/len(values)
+  fmt = NumericFormat(FIXED,1)
+  start = time.perf_counter()
+  for value in values : payload = fmt.payload(value)
+  cached = (time.perf_counter()-start)/len(values)
+  print( f"str() + encode_text()  : {plain*1e6:.2f} us per update" )
+  print( f"NumericFormat.payload(): {cached*1e6:.2f} us per update ({100*fmt.hit_ratios()[1]:.1f}% cache hits)" )
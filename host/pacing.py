@@ -0,0 +1,77 @@
+# pacing.py - Paces the bytes to an SSoS device, so that its serial RX buffer never overflows
+# The firmware reads a byte from the RX buffer (63 bytes) in every loop(), but sometimes blocks: in app_putpattern() when it
+# scrolls in char mode (CHAR-TIME*20 ms per scrolled char), in app_show_strings() (APP_WAIT_MS per string id),
+# and in Serial.print() when its TX buffer is full. Bytes arriving while the RX buffer is full are silently lost.
+# The pacer feeds every byte to an emulator (the model of the device) to know when the device reads each byte,
+# and holds back a byte only until the device has read the byte RX_BUFFER positions before it; otherwise the wire is kept full.
+
+import time
+import collections
+from protocol import BYTE_US, RX_BUFFER, TX_BUFFER
+from emulator import SSoSEmulator
+
+
+# Wraps a serial port (write/read/in_waiting like pyserial), and paces the writes.
+# The model assumes the device is in the state of the `emulator` (default: just booted), and that all writes go via the pacer.
+# `margin` (seconds) is added to every wait, as slack for the scheduling jitter of the host and the time the firmware needs per byte.
+# Time is taken from `clock` (module `time`, or a VirtualClock).
+class Pacer :
+
+  def __init__(self,ser,clock=time,emulator=None,byte_s=BYTE_US/1_000_000,rx_size=RX_BUFFER,margin=0.0001) :
+    self.ser = ser
+    self.clock = clock
+    self.model = emulator if emulator else SSoSEmulator()
+    self.model.txbuf.clear() # the model's output is not used (e.g. the boot banner)
+    self.byte_s = byte_s
+    self.margin = margin
+    self.line_free = clock.monotonic()   # time at which the wire is free for the next byte
+    self.device_free = clock.monotonic() # time at which the device is ready to read the next byte
+    self._starts = collections.deque(maxlen=rx_size) # times at which the device reads the last `rx_size` bytes
+    self.waited_s = 0.0 # total time the pacer held back bytes
+    self.waits = 0      # number of times the pacer held back bytes
+
+  # Returns the time (seconds) the device is blocked by byte `ch` (after it read it), by feeding it to the model.
+  def _stall(self,ch) :
+    delayed_ms = self.model.delayed_ms
+    self.model.loop(ch)
+    txlen = len(self.model.txbuf)
+    self.model.txbuf.clear()
+    return (self.model.delayed_ms-delayed_ms)/1000 + max(0,txlen-TX_BUFFER)*self.byte_s
+
+  # Writes `data`, in chunks; sleeps before a chunk that would overflow the RX buffer of the device.
+  def write(self,data) :
+    chunk = bytearray()
+    for ch in data :
+      now = self.clock.monotonic()
+      if len(self._starts)==self._starts.maxlen :
+        # The byte may only arrive after the device read the byte rx_size positions before it
+        ready = self._starts[0] - self.byte_s + self.margin
+        if ready>max(now,self.line_free) :
+          if chunk : self.ser.write(bytes(chunk))
+          chunk.clear()
+          self.clock.sleep(ready-now)
+          self.waited_s += ready-now
+          self.waits += 1
+          now = ready
+      arrival = max(now,self.line_free) + self.byte_s
+      self.line_free = arrival
+      start = max(arrival,self.device_free)
+      self.device_free = start + self._stall(ch)
+      self._starts.append(start)
+      chunk.append(ch)
+    if chunk : self.ser.write(bytes(chunk))
+    return len(data)
+
+  # Returns the (estimated) time in seconds until the device has processed all bytes written so far.
+  def busy_s(self) :
+    return max(0.0,self.device_free-self.clock.monotonic())
+
+  def read(self,size=1) :
+    return self.ser.read(size)
+
+  @property
+  def in_waiting(self) :
+    return self.ser.in_waiting
+
+  def flush(self) :
+    self.ser.flush()
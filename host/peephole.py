@@ -0,0 +1,218 @@
+# peephole.py - Rewrites recorded SSoS byte streams into shorter streams with the same effect on the display
+# A stream is a list of chunks (the writes of a producer; between writes the producer typically sleeps).
+# Every chunk is replayed through an emulator, and split in segments at the bytes where the device shows something over time:
+# a scroll in char mode (delay), SHOW-STRINGS (delay, serial output), and an incomplete command at the end of the chunk.
+# Those bytes are kept. Every segment in between is replaced by the shortest candidate that ends in the same device state
+# (config commands that changed, then the display content via ssos.transition()), if that candidate is shorter and
+# replaying it through the emulator gives the same state. Typical wins: repeated SET-BRIGHTNESS or blink commands,
+# `\f` followed by four chars, text that is overwritten before a LINE-COMMIT, and `\t...\n` for text that did not change.
+#
+#   python peephole.py   optimizes the demos of the manual's examples and the LEGO numbers demo, and verifies them
+
+import os
+import sys
+import copy
+from protocol import UNITCOUNT, cmd_len, CMD_RESET, CMD_RESET2, CMD_SET_FONT, CMD_SET_BRIGHTNESS, CMD_SET_BLINK_MASK, CMD_SET_BLINK_TIMES
+from protocol import CMD_BLINK_ENABLE, CMD_BLINK_DISABLE, CMD_CHAR_TIME, CMD_DOT_ENABLE, CMD_DOT_DISABLE, CMD_CHAR_ENABLE, CMD_CHAR_DISABLE
+from protocol import CMD_CURSOR_HOME, CMD_CURSOR_LEFT, CMD_CURSOR_RIGHT, CMD_CURSOR_EOLN
+from ssos import transition, _search
+from emulator import SSoSEmulator
+
+
+# The state of the device that matters for what it will show: displays, cursor, modes and driver settings.
+# Not the ISR state (its phase), and only the blink mask bits of existing units.
+def device_state(emulator) :
+  return (tuple(emulator.drv7s_framebuf), tuple(emulator.app_linebuf), emulator.app_cursor,
+          emulator.app_fontid, emulator.app_dotenabled, emulator.app_charenabled, emulator.app_chartime20ms,
+          emulator.drv7s_brightness, emulator.drv7s_alwayshi, emulator.drv7s_framecount, emulator.drv7s_frameshi,
+          emulator.drv7s_noblinkmask & ((1<<UNITCOUNT)-1))
+
+
+# True when the emulator is collecting the arguments of a command.
+def _pending(emulator) :
+  return emulator.app_cmd_argc < cmd_len[emulator.app_cmd_argv[0]]
+
+
+# True when byte `ch` was a RESET (0x00 or its alias 0x1F, also with the high bit) for the emulator that just processed it.
+def _was_reset(emulator,ch) :
+  return (ch & 0x7F) in (CMD_RESET,CMD_RESET2) and emulator.app_cmd_argv[0]==(ch & 0x7F) and emulator.app_cmd_argc==1
+
+
+# Returns the shortest cursor moves from `cursor` to `target`.
+def _cursor_moves(cursor,target) :
+  if cursor==target : return b""
+  candidates = [ bytes([CMD_CURSOR_HOME]) + bytes([CMD_CURSOR_RIGHT])*target ]
+  if target==UNITCOUNT : candidates.append( bytes([CMD_CURSOR_EOLN]) )
+  if target<cursor : candidates.append( bytes([CMD_CURSOR_LEFT])*(cursor-target) )
+  else : candidates.append( bytes([CMD_CURSOR_RIGHT])*(target-cursor) )
+  return min(candidates,key=len)
+
+
+# Returns bytes that bring a device in state `s0` (see device_state) to state `s1`, or None when this encoder can not reach it.
+# Config commands come first (so the content is encoded in the final font, dot and char mode), then the content.
+def encode_state(s0,s1) :
+  fb0,lb0,cur0,font0,dot0,char0,time0,brit0,hi0,count0,frameshi0,mask0 = s0
+  fb1,lb1,cur1,font1,dot1,char1,time1,brit1,hi1,count1,frameshi1,mask1 = s1
+  data = bytearray()
+  if font1!=font0 : data += bytes([CMD_SET_FONT,font1])
+  if brit1!=brit0 : data += bytes([CMD_SET_BRIGHTNESS,brit1])
+  if mask1!=mask0 : data += bytes([CMD_SET_BLINK_MASK,~mask1 & 0x0F])
+  if (count1,frameshi1)!=(count0,frameshi0) : data += bytes([CMD_SET_BLINK_TIMES,frameshi1,(count1-frameshi1) & 0xFF])
+  if hi1!=hi0 : data += bytes([CMD_BLINK_DISABLE if hi1 else CMD_BLINK_ENABLE])
+  if time1!=time0 : data += bytes([CMD_CHAR_TIME,time1])
+  if dot1!=dot0 : data += bytes([CMD_DOT_ENABLE if dot1 else CMD_DOT_DISABLE])
+  if char1!=char0 : data += bytes([CMD_CHAR_ENABLE if char1 else CMD_CHAR_DISABLE])
+  content,fb,lb,cur = transition(fb0,lb0,cur0,fb1,font1,dot1,char1)
+  data += content
+  if lb!=lb1 :
+    if char1 : return None # the line buffer is only written in line mode
+    found = _search(lb,cur,lb1,font1,dot1,8)
+    if found is None : return None
+    content,cur = found
+    data += content
+  data += _cursor_moves(cur,cur1)
+  return bytes(data)
+
+
+# Returns True if `data` brings `emulator` (not changed) to `state`, without delays or serial output.
+def _verify(emulator,data,state) :
+  replay = copy.deepcopy(emulator)
+  delayed_ms = replay.delayed_ms
+  txlen = len(replay.txbuf)
+  replay.write(data)
+  return device_state(replay)==state and replay.delayed_ms==delayed_ms and len(replay.txbuf)==txlen
+
+
+# Rewrites streams chunk by chunk; keeps an emulator with the device state between chunks.
+# The state of the device is only known after the first RESET (or from the start when `known`, e.g. when the client just reset it);
+# bytes before that are kept.
+class PeepholeOptimizer :
+
+  def __init__(self,known=False) :
+    self.emulator = SSoSEmulator()
+    self.emulator.txbuf.clear()
+    self.known = known
+    self.bytes_in = 0
+    self.bytes_out = 0
+
+  # Returns the list of (start,end) ranges of `chunk` that must be kept, found by replaying it on a copy of the emulator,
+  # and whether the device state is known after the chunk.
+  def _barriers(self,chunk) :
+    probe = copy.deepcopy(self.emulator)
+    known = self.known
+    barriers = []
+    continued = _pending(probe) # the chunk starts with the arguments of a command of the previous chunk
+    start = 0 # start of the current command
+    for i,ch in enumerate(chunk) :
+      if not _pending(probe) : start = i
+      delayed_ms = probe.delayed_ms
+      txlen = len(probe.txbuf)
+      probe.loop(ch)
+      if continued and not _pending(probe) or not known or probe.delayed_ms!=delayed_ms or len(probe.txbuf)!=txlen :
+        barriers.append( (start,i+1) )
+        continued = False
+      if _was_reset(probe,ch) : known = True
+    if _pending(probe) : barriers.append( (start,len(chunk)) )
+    merged = []
+    for start,end in barriers :
+      if merged and start<=merged[-1][1] : merged[-1] = (merged[-1][0],max(end,merged[-1][1]))
+      else : merged.append( (start,end) )
+    return merged,known
+
+  # Returns the shortest verified replacement for `segment` (which brings the emulator from its state to `state`).
+  def _rewrite(self,emulator,segment,state) :
+    candidates = []
+    data = encode_state(device_state(emulator),state)
+    if data is not None : candidates.append(data)
+    if state[8] : # not blinking: a RESET (which restarts the blink phase) is invisible
+      reset = SSoSEmulator()
+      reset.write(bytes([CMD_RESET]))
+      data = encode_state(device_state(reset),state)
+      if data is not None : candidates.append( bytes([CMD_RESET])+data )
+    for data in sorted(candidates,key=len) :
+      if len(data)>=len(segment) : break
+      if _verify(emulator,data,state) : return data
+    return segment
+
+  # Returns the optimized `chunk`; the device is in the same state after it as after the original.
+  def optimize_chunk(self,chunk) :
+    chunk = bytes(chunk)
+    out = bytearray()
+    pos = 0
+    barriers,known = self._barriers(chunk)
+    for start,end in barriers+[(len(chunk),len(chunk))] :
+      segment = chunk[pos:start]
+      if segment :
+        before = copy.deepcopy(self.emulator)
+        self.emulator.write(segment)
+        out += self._rewrite(before,segment,device_state(self.emulator))
+      out += chunk[start:end]
+      self.emulator.write(chunk[start:end])
+      pos = end
+    self.known = known
+    self.emulator.txbuf.clear()
+    self.bytes_in += len(chunk)
+    self.bytes_out += len(out)
+    return bytes(out)
+
+  # Returns the optimized chunks of `chunks`.
+  def optimize(self,chunks) :
+    return [ self.optimize_chunk(chunk) for chunk in chunks ]
+
+
+# Returns True if `original` and `optimized` (lists of chunks) give the same device state after every chunk,
+# and the same delays and serial output, when replayed through emulators.
+def verify(original,optimized) :
+  if len(original)!=len(optimized) : return False
+  a = SSoSEmulator()
+  b = SSoSEmulator()
+  for chunk0,chunk1 in zip(original,optimized) :
+    a.write(chunk0)
+    b.write(chunk1)
+    if device_state(a)!=device_state(b) or a.delayed_ms!=b.delayed_ms or a.read()!=b.read() : return False
+  return True
+
+
+# Collects the writes of a producer as chunks; also stands in for module `time` (sleeps are not needed to optimize).
+class Recorder :
+
+  def __init__(self) :
+    self.chunks = []
+
+  def write(self,data) :
+    self.chunks.append(bytes(data))
+    return len(data)
+
+  def sleep(self,seconds) :
+    pass
+
+
+# Returns the streams of the manual's examples (by demo name) and of the LEGO numbers demo, as lists of chunks.
+def sample_streams() :
+  sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","manual","examples"))
+  import examples
+  streams = {}
+  for name,demo in vars(examples).items() :
+    if not name.startswith("demo_0x") : continue
+    recorder = Recorder()
+    examples.ssos = recorder
+    examples.time = recorder
+    demo()
+    streams[name] = recorder.chunks
+  left = [ b"\f"+str(i/10).encode() for i in range(0,1234,7) ]
+  right = [ b"\t"+str(i/10).encode()+b"\n" for i in range(0,1234,7) ]
+  streams["lego_numbers"] = [b"\0"] + left + [b"\fdone",b"\x11"] + right + [b"done\n"]
+  return streams
+
+
+# The entry point for command line use: optimizes and verifies the sample streams
+if __name__ == "__main__":
+  total_in = total_out = 0
+  for name,chunks in sample_streams().items() :
+    optimizer = PeepholeOptimizer()
+    optimized = optimizer.optimize(chunks)
+    ok = verify(chunks,optimized)
+    total_in += optimizer.bytes_in
+    total_out += optimizer.bytes_out
+    print( f"{name:34} {optimizer.bytes_in:5} -> {optimizer.bytes_out:5} bytes  {'equivalent' if ok else 'NOT EQUIVALENT'}" )
+  print( f"{'total':34} {total_in:5} -> {total_out:5} bytes ({100*(total_in-total_out)/total_in:.0f}% less)" )
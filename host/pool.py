@@ -0,0 +1,134 @@
+# pool.py - A pool of serial connections to SSoS devices, opened once without resetting the board
+# Opening a serial port normally raises DTR, which resets the Pro Mini (its bootloader then takes 2 seconds).
+# The pool opens every port once with DTR low (the trick of the manual's examples), hands out leases to many producers,
+# health-checks the connections with a probe, and reconnects (again without DTR) when a probe fails.
+
+import time
+import threading
+import contextlib
+import serial
+import serial.tools.list_ports
+from protocol import BAUDRATE
+from ssos import SSoS
+from introspect import query
+
+
+# Opens `port` without resetting the board: the port is configured with DTR low before it is opened.
+# With a `write_timeout` (seconds), a write to a stalled port raises serial.SerialTimeoutException instead of blocking.
+def open_port(port,baudrate=BAUDRATE,timeout=1.0,write_timeout=1.0) :
+  ser = serial.Serial(None,baudrate,timeout=timeout,write_timeout=write_timeout) # port=None, so not yet opened
+  ser.dtr = False # Makes sure the board does not reset (would take 2 seconds)
+  ser.port = port
+  ser.open()
+  return ser
+
+
+# Returns the port (device name) for `key`: the key itself if it is a port, else the port of the USB serial with serial number `key`.
+def resolve(key) :
+  ports = serial.tools.list_ports.comports()
+  for info in ports :
+    if info.device==key : return key
+  for info in ports :
+    if info.serial_number==key : return info.device
+  return key # e.g. a pty, which is not listed
+
+
+# One pooled connection; use it via ConnectionPool.lease().
+class Connection :
+
+  def __init__(self,key,port,baudrate,timeout) :
+    self.key = key
+    self.port = port
+    self.baudrate = baudrate
+    self.timeout = timeout
+    self.ser = None
+    self.opens = 0        # number of times the port was opened
+    self.checked = None   # time of the last successful probe
+    self.info = None      # the DeviceInfo of the last successful probe
+    self.lock = threading.Lock()
+    self._ssos = None
+
+  # The client for this connection, created on first use (it sends RESET, so the mirror is in sync); recreated after a reconnect.
+  @property
+  def ssos(self) :
+    if self._ssos is None : self._ssos = SSoS(self.ser)
+    return self._ssos
+
+  def open(self) :
+    self.ser = open_port(self.port,self.baudrate,self.timeout)
+    self.opens += 1
+    self._ssos = None
+
+  def close(self) :
+    if self.ser is not None : self.ser.close()
+    self.ser = None
+    self._ssos = None
+
+  # Closes and reopens the port (without DTR, so the board is not reset).
+  def reconnect(self) :
+    self.close()
+    self.open()
+
+  # Queries the device (SHOW-STRINGS with an empty range, see introspect.py); returns True if it answered within the timeout.
+  # The snapshot of the device is kept in `info`.
+  def probe(self) :
+    try :
+      self.info = query(self.ser,self.timeout)
+    except (OSError,AttributeError,TimeoutError,ValueError) : # also serial.SerialException; AttributeError when closed (ser is None)
+      return False
+    self.checked = time.monotonic()
+    return True
+
+
+# Hands out leases on connections, keyed by port or USB serial number. A connection is opened on its first lease, and then kept open.
+# A lease is exclusive (producers take turns). A connection is probed on lease when it was not probed for `check_s` seconds;
+# when the probe fails it is reconnected (and probed again). `timeout` is the read timeout of the ports (for the probe).
+class ConnectionPool :
+
+  def __init__(self,baudrate=BAUDRATE,timeout=1.0,check_s=10.0) :
+    self.baudrate = baudrate
+    self.timeout = timeout
+    self.check_s = check_s
+    self.connections = {}
+    self._lock = threading.Lock()
+
+  # Returns the connection for `key` (created, not yet opened, on first use).
+  def get(self,key) :
+    with self._lock :
+      if key not in self.connections :
+        self.connections[key] = Connection(key,resolve(key),self.baudrate,self.timeout)
+      return self.connections[key]
+
+  # Makes sure `connection` is open and healthy; raises serial.SerialException if the device does not answer after a reconnect.
+  def _check(self,connection) :
+    if connection.ser is None :
+      connection.open()
+    elif connection.checked is not None and time.monotonic()-connection.checked<self.check_s :
+      return
+    if connection.probe() : return
+    connection.reconnect()
+    if not connection.probe() : raise serial.SerialException(f"SSoS on {connection.port} does not answer")
+
+  # Leases the connection for `key`, for use in a with statement: `with pool.lease("COM3") as connection: connection.ssos.show("on")`.
+  # Waits at most `timeout` seconds for other producers (None: forever); raises TimeoutError when it expires.
+  # When the body raises an OSError (e.g. the port went away), the connection is closed, so the next lease reopens it.
+  @contextlib.contextmanager
+  def lease(self,key,timeout=None) :
+    connection = self.get(key)
+    if not connection.lock.acquire(timeout=-1 if timeout is None else timeout) :
+      raise TimeoutError(f"lease on {key} timed out")
+    try :
+      self._check(connection)
+      yield connection
+    except OSError :
+      connection.close()
+      raise
+    finally :
+      connection.lock.release()
+
+  # Closes all connections.
+  def close(self) :
+    with self._lock :
+      for connection in self.connections.values() :
+        connection.close()
+      self.connections.clear()
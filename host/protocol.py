@@ -0,0 +1,82 @@
+# protocol.py - The wire protocol of the SSoS device, as implemented by firmware/SSoS/SSoS.ino
+
+
+# Static system configuration of the device (see firmware/SSoS/drv7s.h)
+UNITCOUNT = 4          # DRV7S_UNITCOUNT: number of 7-segment units
+SLOTCOUNT = 5          # DRV7S_SLOTCOUNT: number of brightness slots
+BAUDRATE  = 115200     # Serial.begin() in setup()
+BYTE_US   = 10*1_000_000/BAUDRATE # Time on the wire for one byte (start bit, 8 data bits, stop bit), ~87us
+RX_BUFFER = 63         # SERIAL_RX_BUFFER_SIZE (64) of the AVR core is a ring buffer, it holds 63 bytes; more are dropped
+TX_BUFFER = 63         # SERIAL_TX_BUFFER_SIZE (64) likewise; when full, Serial.print() blocks until a byte is sent
+
+
+# The control characters (commands)
+CMD_RESET           = 0x00
+CMD_SET_FONT        = 0x01
+CMD_SET_BRIGHTNESS  = 0x02
+CMD_SET_BLINK_MASK  = 0x03
+CMD_SET_BLINK_TIMES = 0x04
+CMD_SHOW_STRINGS    = 0x05
+CMD_CURSOR_RIGHT    = 0x06
+CMD_BLINK_ENABLE    = 0x07
+CMD_CURSOR_LEFT     = 0x08
+CMD_CURSOR_EOLN     = 0x09
+CMD_LINE_COMMIT     = 0x0A
+CMD_BLINK_DISABLE   = 0x0B
+CMD_CLEAR_AND_HOME  = 0x0C
+CMD_CURSOR_HOME     = 0x0D
+CMD_DOT_DISABLE     = 0x0E
+CMD_DOT_ENABLE      = 0x0F
+CMD_CHAR_ENABLE     = 0x10
+CMD_CHAR_DISABLE    = 0x11
+CMD_CHAR_TIME       = 0x12
+CMD_PATTERN_ONE     = 0x13
+CMD_PATTERN_ALL     = 0x14
+CMD_RESET2          = 0x1F # Duplicate of CMD_RESET (in case the host can not send 0x00)
+
+
+# Copy of app_cmd_len[]: the length of each command plus arguments.
+# A length of 0 indicates not-a-command (ignored), 1 indicates command-without-args, 2 indicates command-with-one byte arg, etc
+cmd_len = [
+  1, # RESET
+  2, # SET-FONT(0..1)
+  2, # SET-BRIGHTNESS(1..5)
+  2, # SET-BLINK-MASK(0..F)
+  3, # SET-BLINK-TIMES(0..FF,0..FF)
+  3, # SHOW-STRINGS(from,to)
+  1, # CURSOR-RIGHT
+  1, # BLINK-ENABLE
+  1, # CURSOR-LEFT
+  1, # CURSOR-EOLN
+  1, # LINE-COMMIT
+  1, # BLINK-DISABLE
+  1, # CLEAR-AND-HOME
+  1, # CURSOR-HOME
+  1, # DOT-DISABLE
+  1, # DOT-ENABLE
+  1, # CHAR-ENABLE
+  1, # CHAR-DISABLE
+  2, # CHAR-TIME
+  2, # PATTERN-ONE(pat)
+  5, # PATTERN-ALL(p0,p1,p2,p3)
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  0, # ignored
+  1, # RESET (duplicate of 00)
+]
+
+
+# Human readable names of the commands (None for the ignored control characters)
+cmd_name = [
+  "RESET", "SET-FONT", "SET-BRIGHTNESS", "SET-BLINK-MASK", "SET-BLINK-TIMES", "SHOW-STRINGS", "CURSOR-RIGHT", "BLINK-ENABLE",
+  "CURSOR-LEFT", "CURSOR-EOLN", "LINE-COMMIT", "BLINK-DISABLE", "CLEAR-AND-HOME", "CURSOR-HOME", "DOT-DISABLE", "DOT-ENABLE",
+  "CHAR-ENABLE", "CHAR-DISABLE", "CHAR-TIME", "PATTERN-ONE", "PATTERN-ALL", None, None, None,
+  None, None, None, None, None, None, None, "RESET",
+]
@@ -0,0 +1,120 @@
+# schedule.py - Plays timed update sequences against absolute deadlines, so they do not drift
+# The manual's examples pace with time.sleep(n) after every write: the time of the write itself, GC pauses and OS jitter add up,
+# so a long sequence drifts from the wall clock (and from sequences on other displays).
+# The scheduler instead sleeps until the absolute deadline of every update (start + offset, on the monotonic clock),
+# measures how late each update was, and when it is behind skips (or merges) updates that are already overdue.
+
+import time
+
+
+SKIP  = "skip"  # when behind: drop overdue updates, only the newest overdue update is done
+MERGE = "merge" # when behind: do all overdue updates at once, without waiting in between (e.g. when every update is needed)
+KEEP  = "keep"  # never drop: do every update as soon as possible
+
+
+# Statistics of a playback: lateness (seconds) of every done update, and the number of skipped updates.
+class Lateness :
+
+  def __init__(self) :
+    self.late = []
+    self.skipped = 0
+
+  def add(self,late) :
+    self.late.append(late)
+
+  @property
+  def count(self) :
+    return len(self.late)
+
+  @property
+  def max(self) :
+    return max(self.late,default=0.0)
+
+  @property
+  def mean(self) :
+    return sum(self.late)/len(self.late) if self.late else 0.0
+
+  # The `fraction` (e.g. 0.99) percentile of the lateness.
+  def percentile(self,fraction) :
+    if not self.late : return 0.0
+    late = sorted(self.late)
+    return late[min(len(late)-1,int(fraction*len(late)))]
+
+  def __str__(self) :
+    return f"{self.count} done, {self.skipped} skipped, late mean {self.mean*1000:.3f} ms, p99 {self.percentile(0.99)*1000:.3f} ms, max {self.max*1000:.3f} ms"
+
+
+# Plays updates at absolute deadlines. An update is (offset in seconds from the start, function to call).
+# `tolerance` (seconds) is how late an update may be before the scheduler considers itself behind.
+# `policy` (SKIP, MERGE, KEEP) decides what happens with overdue updates. Time is taken from `clock` (module `time`, or a VirtualClock).
+class Scheduler :
+
+  def __init__(self,clock=time,tolerance=0.010,policy=SKIP) :
+    self.clock = clock
+    self.tolerance = tolerance
+    self.policy = policy
+    self.stats = Lateness() # of the last play()
+
+  # Plays `updates` (sorted by offset) with `start` (a monotonic time, default now) as time 0; returns the Lateness of this playback.
+  # Several sequences (e.g. on several displays) stay in sync when they are played with the same `start`.
+  def play(self,updates,start=None) :
+    clock = self.clock
+    if start is None : start = clock.monotonic()
+    updates = list(updates)
+    stats = self.stats = Lateness()
+    i = 0
+    while i<len(updates) :
+      offset,update = updates[i]
+      deadline = start+offset
+      now = clock.monotonic()
+      if now<deadline :
+        clock.sleep(deadline-now)
+        now = clock.monotonic()
+      if now-deadline>self.tolerance and self.policy!=KEEP :
+        # Behind: `last` is the newest update whose deadline has passed
+        last = i
+        while last+1<len(updates) and start+updates[last+1][0]<=now : last += 1
+        if self.policy==SKIP :
+          stats.skipped += last-i
+        else :
+          for overdue_offset,overdue in updates[i:last] :
+            overdue()
+            stats.add(now-(start+overdue_offset))
+        i = last
+        offset,update = updates[i]
+        deadline = start+offset
+      update()
+      stats.add(now-deadline)
+      i += 1
+    return stats
+
+
+# Returns updates that write frame `frames[k]` to `ser` every `period` seconds (e.g. a countdown: one frame per second).
+def frame_updates(ser,frames,period) :
+  return [ (k*period, lambda frame=frame : ser.write(frame)) for k,frame in enumerate(frames) ]
+
+
+# Returns the updates of a countdown from `seconds` to 0 on the SSoS client `ssos` (one update per second).
+def countdown(ssos,seconds) :
+  return [ (k, lambda left=seconds-k : ssos.show(f"{left:4d}")) for k in range(seconds+1) ]
+
+
+# The entry point for command line use: compares pacing with sleep() to the scheduler, for an hour long countdown on virtual time.
+# Every write takes 2 ms, plus a 50 ms pause (e.g. GC) about every 100 writes; with sleep(1) after every write these add up.
+if __name__ == "__main__":
+  import random
+  from virtualclock import VirtualClock
+  rnd = random.Random(0)
+  def write(clock) :
+    clock.sleep( 0.002 + rnd.random()*0.001 + (0.050 if rnd.random()<0.01 else 0) )
+  seconds = 3600
+  clock = VirtualClock()
+  for k in range(seconds+1) :
+    write(clock)
+    if k<seconds : clock.sleep(1)
+  print( f"sleep(1) after every write : last update at {clock.now:9.3f} s, drift {clock.now-seconds:7.3f} s" )
+  clock = VirtualClock()
+  scheduler = Scheduler(clock)
+  stats = scheduler.play( [ (k, lambda : write(clock)) for k in range(seconds+1) ] )
+  print( f"scheduler (absolute)      : last update at {clock.now:9.3f} s, drift {clock.now-seconds:7.3f} s" )
+  print( f"  {stats}" )
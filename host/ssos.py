@@ -0,0 +1,253 @@
+# ssos.py - Host side client for the Seven Segment over Serial (SSoS) device
+# Keeps a mirror of the display state, so that every update is sent with the fewest possible bytes.
+
+import heapq
+import functools
+from protocol import UNITCOUNT, CMD_RESET, CMD_SET_FONT, CMD_CURSOR_RIGHT, CMD_CURSOR_LEFT, CMD_CURSOR_EOLN, CMD_LINE_COMMIT
+from protocol import CMD_CLEAR_AND_HOME, CMD_CURSOR_HOME, CMD_DOT_DISABLE, CMD_DOT_ENABLE, CMD_CHAR_ENABLE, CMD_CHAR_DISABLE
+from protocol import CMD_PATTERN_ONE, CMD_PATTERN_ALL, CMD_SET_BRIGHTNESS, CMD_SET_BLINK_MASK, CMD_SET_BLINK_TIMES
+from protocol import CMD_BLINK_ENABLE, CMD_BLINK_DISABLE, CMD_CHAR_TIME, SLOTCOUNT, cmd_len
+from font7s import FONT_LOOKALIKE7S, font_get, encode_text
+
+
+# Maps every pattern to the single byte that the firmware's loop() turns into that pattern (or None if there is none).
+# Bytes whose lower 7 bits are below 0x20 are commands, and a '.' (also 0xAE) is a dot when dot is enabled.
+# When several bytes map to the same pattern, the lowest one is used.
+@functools.lru_cache(maxsize=None)
+def char_table(fontid,dotenabled) :
+  table = [None]*256
+  for ch in reversed(range(256)) :
+    ascii = ch & 0x7F
+    if ascii<0x20 : continue
+    if ascii==ord('.') and dotenabled : continue
+    table[font_get(fontid,ch)] = ch
+  return table
+
+
+# Converts `text` (str or bytes) to the UNITCOUNT patterns that app_putchars() would show:
+# clips or pads with blanks, and a '.' after a character lights the dot of that character.
+def text_to_patterns(text,fontid=FONT_LOOKALIKE7S) :
+  return tuple(encode_text(text,fontid,UNITCOUNT))
+
+
+# Returns the list of moves possible in state (`buf`,`cursor`) as tuples (bytes,newbuf,newcursor).
+# Only patterns that are needed for `target` are written, and the cursor never goes beyond the end (no scrolling).
+def _moves(buf,cursor,target,fontid,dotenabled) :
+  moves = []
+  moves.append( (bytes([CMD_CLEAR_AND_HOME]),(0,)*UNITCOUNT,0) )
+  moves.append( (bytes([CMD_CURSOR_HOME]),buf,0) )
+  moves.append( (bytes([CMD_CURSOR_EOLN]),buf,UNITCOUNT) )
+  if cursor>0 : moves.append( (bytes([CMD_CURSOR_LEFT]),buf,cursor-1) )
+  if cursor<UNITCOUNT : moves.append( (bytes([CMD_CURSOR_RIGHT]),buf,cursor+1) )
+  if dotenabled and cursor>0 :
+    newbuf = list(buf)
+    newbuf[cursor-1] |= 0x80
+    moves.append( (b'.',tuple(newbuf),cursor) )
+  if cursor<UNITCOUNT :
+    patterns = {target[cursor]}
+    if dotenabled : patterns.add(target[cursor] & 0x7F) # to be completed with a '.'
+    table = char_table(fontid,dotenabled)
+    for pattern in patterns :
+      ch = table[pattern]
+      data = bytes([CMD_PATTERN_ONE,pattern]) if ch is None else bytes([ch])
+      newbuf = list(buf)
+      newbuf[cursor] = pattern
+      moves.append( (data,tuple(newbuf),cursor+1) )
+  return moves
+
+
+# Returns the shortest byte sequence (plain chars, '.', PATTERN-ONE, cursor commands, CLEAR-AND-HOME) that changes
+# `buf` (with the cursor at `cursor`) into `target`, as tuple (bytes,cursor), or None if that needs `limit` or more bytes.
+# This is a shortest path search (Dijkstra) over the (buffer,cursor) states, with bytes as cost.
+def _search(buf,cursor,target,fontid,dotenabled,limit) :
+  start = (buf,cursor)
+  best = {start:0}
+  prev = {start:None}
+  queue = [(0,0,start)]
+  count = 1 # tie breaker for the heap, so that states are never compared
+  while queue :
+    cost,_,state = heapq.heappop(queue)
+    if cost>best[state] : continue
+    if state[0]==target :
+      final = state[1]
+      path = []
+      while prev[state] :
+        state,data = prev[state]
+        path.append(data)
+      return b''.join(reversed(path)),final
+    for data,newbuf,newcursor in _moves(*state,target,fontid,dotenabled) :
+      newcost = cost+len(data)
+      newstate = (newbuf,newcursor)
+      if newcost>=limit or newcost>=best.get(newstate,limit) : continue
+      best[newstate] = newcost
+      prev[newstate] = (state,data)
+      heapq.heappush(queue,(newcost,count,newstate))
+      count += 1
+  return None
+
+
+# Returns the number of bytes in `data` (char mode bytes, as _search() produces them) that write drv7s_framebuf[].
+# The ISR may show the display between any two of them; with one (or none) the update is atomic.
+def _framebuf_writes(data) :
+  writes = 0
+  i = 0
+  while i<len(data) :
+    ch = data[i] & 0x7F
+    if ch>=0x20 or ch in (CMD_CLEAR_AND_HOME,CMD_PATTERN_ONE,CMD_PATTERN_ALL) : writes += 1
+    i += max(1,cmd_len[ch]) if ch<0x20 else 1
+  return writes
+
+
+# Computes the cheapest bytes to change the display from `framebuf` to `target` (both tuples of UNITCOUNT patterns).
+# The other arguments are the device state (app_linebuf, app_cursor, app_fontid, app_dotenabled, app_charenabled).
+# Returns a tuple (bytes,framebuf,linebuf,cursor) with the bytes to send and the device state after sending them.
+# In character mode the framebuffer is edited in place; in line mode the line buffer is composed and committed.
+# The fallback is always PATTERN-ALL (5 bytes), which does not depend on the cursor or mode.
+# With `atomic`, character mode edits that write the framebuffer more than once are replaced by the fallback,
+# so the ISR never shows a mix of old and new content (line mode is atomic anyway: LINE-COMMIT copies all units at once).
+@functools.lru_cache(maxsize=4096)
+def transition(framebuf,linebuf,cursor,target,fontid,dotenabled,charenabled,atomic=False) :
+  if framebuf==target : return b'',framebuf,linebuf,cursor
+  fallback = (bytes([CMD_PATTERN_ALL])+bytes(target),target,linebuf,cursor)
+  if charenabled :
+    found = _search(framebuf,cursor,target,fontid,dotenabled,len(fallback[0]))
+    if found is None : return fallback
+    data,cursor = found
+    if atomic and _framebuf_writes(data)>1 : return fallback
+    return data,target,linebuf,cursor
+  else :
+    found = _search(linebuf,cursor,target,fontid,dotenabled,len(fallback[0])-1)
+    if found is None : return fallback
+    data,cursor = found
+    return data+bytes([CMD_LINE_COMMIT]),target,(0,)*UNITCOUNT,0
+
+
+# Returns (framecount,frameshi) as drv7s_blinking_hilo_set() stores SET-BLINK-TIMES(`hi`,`lo`): clipped to 1..254, and 255 on overflow.
+def blink_times(hi,lo) :
+  hi = min(max(hi,1),254)
+  lo = min(max(lo,1),254)
+  count = (hi+lo) & 0xFF
+  return (count if count>hi else 255, hi)
+
+
+# The client: wraps a serial port and mirrors the state of the device.
+# All writes must go via the client, otherwise the mirror is out of sync (call reset() to resync).
+# Configuration commands that would not change the (mirrored) state are not sent, so callers may set the configuration
+# with every update. When the mirror is not trusted (see invalidate()), the next command first sends one RESET.
+class SSoS :
+
+  # `ser` is an (opened) serial.Serial, or any other object with a write(bytes) method.
+  # The device state is unknown, so by default a RESET is sent to get in sync.
+  # With `atomic` every update changes the display in one step (no torn frames, see isr/isrtear.py), at the cost of some bytes.
+  def __init__(self,ser,reset=True,atomic=False) :
+    self.ser = ser
+    self.atomic = atomic
+    self.bytecount = 0  # Number of bytes written so far
+    self.suppressed = 0 # Number of configuration commands not sent, because they would not change the state
+    self._set_defaults()
+    if reset : self.reset()
+
+  # Sets the mirror to the state after app_reset() (which includes drv7s_reset())
+  def _set_defaults(self) :
+    self.known = True
+    self.framebuf = (0,)*UNITCOUNT
+    self.linebuf = (0,)*UNITCOUNT
+    self.cursor = 0
+    self.fontid = FONT_LOOKALIKE7S
+    self.dotenabled = 1
+    self.charenabled = 1
+    self.chartime = 0x19
+    self.brightness = 4
+    self.blinkenabled = 0
+    self.blinkmask = 0x0F # units that blink (SET-BLINK-MASK), the firmware stores the inverse
+    self.blinktimes = blink_times(0x19,0x19)
+
+  def _write(self,data) :
+    if data :
+      self.ser.write(data)
+      self.bytecount += len(data)
+
+  # Returns the RESET to send in front of the next command (in the same write) if the mirror is not trusted, else b''.
+  # The mirror is set to the state after the RESET.
+  def _sync(self) :
+    if self.known : return b''
+    self._set_defaults()
+    return bytes([CMD_RESET])
+
+  # Sends configuration command `data`, which sets mirror attribute `name` to `value`; not if it already has that value.
+  def _set(self,name,value,data) :
+    reset = self._sync()
+    if getattr(self,name)==value :
+      self.suppressed += 1
+      self._write(reset)
+      return
+    self._write(reset+data)
+    setattr(self,name,value)
+
+  # Sends a RESET (display blank, default font, dot and char mode enabled, default brightness and blinking).
+  def reset(self) :
+    self._write(bytes([CMD_RESET]))
+    self._set_defaults()
+
+  # Marks the mirror as not trusted (e.g. after a reconnect or a failed write, or after writing to the port directly);
+  # the next command sends a RESET in front of its bytes (in one write).
+  def invalidate(self) :
+    self.known = False
+
+  # Selects the font used for plain chars (FONT_LOOKALIKE7S or FONT_UNIQUE7S).
+  def set_font(self,fontid) :
+    fontid &= 0xFF
+    self._set("fontid",fontid % 2,bytes([CMD_SET_FONT,fontid]))
+
+  # Enables or disables dot replacement ('.' lights the dot of the previous unit).
+  def set_dot(self,enabled) :
+    self._set("dotenabled",1 if enabled else 0,bytes([CMD_DOT_ENABLE if enabled else CMD_DOT_DISABLE]))
+
+  # Enables character mode (True) or line mode (False).
+  def set_char(self,enabled) :
+    self._set("charenabled",1 if enabled else 0,bytes([CMD_CHAR_ENABLE if enabled else CMD_CHAR_DISABLE]))
+
+  # Sets the time (in units of 20 ms) the device waits per scrolled char in character mode.
+  def set_chartime(self,time20ms) :
+    time20ms &= 0xFF
+    self._set("chartime",time20ms,bytes([CMD_CHAR_TIME,time20ms]))
+
+  # Sets the brightness (1..5).
+  def set_brightness(self,level) :
+    level &= 0xFF
+    self._set("brightness",min(max(level % 16,1),SLOTCOUNT),bytes([CMD_SET_BRIGHTNESS,level]))
+
+  # Enables or disables blinking.
+  def set_blink(self,enabled) :
+    self._set("blinkenabled",1 if enabled else 0,bytes([CMD_BLINK_ENABLE if enabled else CMD_BLINK_DISABLE]))
+
+  # Selects the units that blink (bit 0 is unit 0).
+  def set_blink_mask(self,mask) :
+    mask &= 0xFF
+    self._set("blinkmask",mask % 16,bytes([CMD_SET_BLINK_MASK,mask]))
+
+  # Sets the number of frames (of 20 ms) the blinking units are on (`hi`) and off (`lo`).
+  def set_blink_times(self,hi,lo) :
+    hi &= 0xFF
+    lo &= 0xFF
+    self._set("blinktimes",blink_times(hi,lo),bytes([CMD_SET_BLINK_TIMES,hi,lo]))
+
+  # Returns the bytes that would change the display to `patterns` (UNITCOUNT ints), without sending them.
+  def encode(self,patterns) :
+    data,*_ = transition(self.framebuf,self.linebuf,self.cursor,tuple(patterns),self.fontid,self.dotenabled,self.charenabled,self.atomic)
+    return data
+
+  # Changes the display to show `patterns` (UNITCOUNT ints), sending the fewest bytes.
+  # Returns the number of bytes sent.
+  def show_patterns(self,patterns) :
+    patterns = tuple(patterns)
+    assert len(patterns)==UNITCOUNT
+    reset = self._sync()
+    data,self.framebuf,self.linebuf,self.cursor = transition(self.framebuf,self.linebuf,self.cursor,patterns,self.fontid,self.dotenabled,self.charenabled,self.atomic)
+    self._write(reset+data)
+    return len(reset)+len(data)
+
+  # Changes the display to show `text` (as app_putchars() would: clipped, padded, dots merged), sending the fewest bytes.
+  # Returns the number of bytes sent.
+  def show(self,text) :
+    return self.show_patterns(text_to_patterns(text,self.fontid))
@@ -0,0 +1,203 @@
+# stats.py - Instrumentation of the writes to SSoS devices: bytes and invocations per command, write latency and queue wait histograms
+# A WriteMeter wraps a serial port (or anything with write()) and decodes what is written with the stream decoder (decoder.py),
+# counting invocations and bytes per command (and for chars). Every write is timed into a histogram; producers with a queue
+# (e.g. the manager) add the time a frame waited. snapshot() is a cheap copy of the counters; prometheus() renders the
+# Prometheus text format, and a Reporter logs or dumps that periodically.
+#
+#   python stats.py   measures the overhead of the instrumentation, and prints a dump for a counter demo
+
+import time
+import bisect
+import threading
+from protocol import cmd_name, cmd_len, BYTE_US
+from decoder import StreamDecoder, Command
+
+
+# Upper bounds (seconds) of the histogram buckets: from 10 us (a write to a buffer) to 3 s (a stalled port)
+LATENCY_BUCKETS = (0.00001,0.00003,0.0001,0.0003,0.001,0.003,0.01,0.03,0.1,0.3,1.0,3.0)
+
+CHARS = "CHARS" # the name under which plain chars (and dots) are counted
+
+
+# A histogram with fixed buckets (as Prometheus has them): counts per bucket (the last is +Inf), the sum and the count.
+class Histogram :
+
+  def __init__(self,buckets=LATENCY_BUCKETS) :
+    self.buckets = tuple(buckets)
+    self.counts = [0]*(len(self.buckets)+1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self,value) :
+    self.counts[bisect.bisect_left(self.buckets,value)] += 1
+    self.sum += value
+    self.count += 1
+
+  # The upper bound of the bucket that holds the `fraction` (e.g. 0.99) quantile (inf if in the last bucket, 0.0 if empty).
+  def quantile(self,fraction) :
+    if not self.count : return 0.0
+    rank = fraction*self.count
+    total = 0
+    for bound,count in zip(self.buckets+(float("inf"),),self.counts) :
+      total += count
+      if total>=rank : return bound
+    return float("inf")
+
+  def snapshot(self) :
+    return { "buckets":self.buckets, "counts":list(self.counts), "sum":self.sum, "count":self.count }
+
+
+# Wraps serial port `ser` of device `name`, and counts what is written; reads are passed on.
+# Per command (by name, see protocol.cmd_name, and CHARS): invocations and bytes. A command whose arguments
+# are split over writes is counted when it is complete. Writes are timed with `timer` (seconds).
+class WriteMeter :
+
+  def __init__(self,ser,name="",timer=time.perf_counter) :
+    self.ser = ser
+    self.name = name
+    self.timer = timer
+    self.decoder = StreamDecoder()
+    self.invocations = [0]*32 # per command code
+    self.chars = 0            # runs of chars
+    self.charbytes = 0
+    self.writes = 0
+    self.bytes = 0
+    self.write_s = Histogram()
+    self.wait_s = Histogram()
+    self._lock = threading.Lock() # the writer and snapshot() may run in different threads
+
+  def write(self,data) :
+    start = self.timer()
+    result = self.ser.write(data)
+    duration = self.timer()-start
+    with self._lock :
+      self.write_s.observe(duration)
+      self.writes += 1
+      self.bytes += len(data)
+      for event in self.decoder.feed(data) :
+        if type(event) is Command :
+          self.invocations[event.code] += 1
+        else :
+          self.chars += 1
+          self.charbytes += len(event.data)
+    return result
+
+  # Adds the time (seconds) a frame waited in the queue of the producer before it was written.
+  def observe_wait(self,seconds) :
+    with self._lock :
+      self.wait_s.observe(seconds)
+
+  def read(self,size=1) :
+    return self.ser.read(size)
+
+  @property
+  def in_waiting(self) :
+    return self.ser.in_waiting
+
+  def flush(self) :
+    self.ser.flush()
+
+  # Returns a copy of the counters: {"name","writes","bytes","ignored","commands":{name:(invocations,bytes)},"write_s","wait_s"}.
+  def snapshot(self) :
+    with self._lock :
+      commands = {}
+      for code,count in enumerate(self.invocations) :
+        if count : commands[cmd_name[code]] = (count,count*cmd_len[code])
+      if self.chars : commands[CHARS] = (self.chars,self.charbytes)
+      return { "name":self.name, "writes":self.writes, "bytes":self.bytes, "ignored":self.decoder.ignored, "commands":commands,
+               "write_s":self.write_s.snapshot(), "wait_s":self.wait_s.snapshot() }
+
+
+def _histogram_lines(metric,labels,histogram) :
+  lines = []
+  total = 0
+  for bound,count in zip(list(histogram["buckets"])+["+Inf"],histogram["counts"]) :
+    total += count
+    lines.append( f'{metric}_bucket{{{labels},le="{bound}"}} {total}' )
+  lines.append( f'{metric}_sum{{{labels}}} {histogram["sum"]:.9f}' )
+  lines.append( f'{metric}_count{{{labels}}} {histogram["count"]}' )
+  return lines
+
+
+# Returns the snapshots of `meters` in the Prometheus text exposition format.
+def prometheus(meters) :
+  snapshots = [ meter.snapshot() for meter in meters ]
+  lines = [ "# HELP ssos_commands_total Commands written to the device, by command (CHARS: runs of chars).",
+            "# TYPE ssos_commands_total counter" ]
+  for s in snapshots :
+    for command,(count,size) in s["commands"].items() :
+      lines.append( f'ssos_commands_total{{device="{s["name"]}",command="{command}"}} {count}' )
+  lines += [ "# HELP ssos_command_bytes_total Bytes written to the device, by command.",
+             "# TYPE ssos_command_bytes_total counter" ]
+  for s in snapshots :
+    for command,(count,size) in s["commands"].items() :
+      lines.append( f'ssos_command_bytes_total{{device="{s["name"]}",command="{command}"}} {size}' )
+  lines += [ "# HELP ssos_write_seconds Duration of write() calls.", "# TYPE ssos_write_seconds histogram" ]
+  for s in snapshots :
+    lines += _histogram_lines("ssos_write_seconds",f'device="{s["name"]}"',s["write_s"])
+  lines += [ "# HELP ssos_queue_wait_seconds Time a frame waited before it was written.", "# TYPE ssos_queue_wait_seconds histogram" ]
+  for s in snapshots :
+    lines += _histogram_lines("ssos_queue_wait_seconds",f'device="{s["name"]}"',s["wait_s"])
+  return "\n".join(lines)+"\n"
+
+
+# Returns a one line summary of the snapshot of `meter`, for a log.
+def summary(meter) :
+  s = meter.snapshot()
+  top = sorted(s["commands"].items(),key=lambda item : -item[1][1])[:4]
+  commands = ", ".join( f"{command} {size}" for command,(count,size) in top )
+  write = meter.write_s
+  return ( f"{s['name']}: {s['writes']} writes, {s['bytes']} bytes ({commands}), "
+           f"write p50 {write.quantile(0.5)*1000:g} ms p99 {write.quantile(0.99)*1000:g} ms, wait p99 {meter.wait_s.quantile(0.99)*1000:g} ms" )
+
+
+# Calls `out` (default print) every `period` seconds with the report of `meters` (a list, or a function returning the list);
+# the report is prometheus() or, with `fmt=summary`, a summary line per meter. Runs in a daemon thread until stop().
+class Reporter :
+
+  def __init__(self,meters,period=60.0,out=print,fmt=prometheus) :
+    self.meters = meters
+    self.period = period
+    self.out = out
+    self.fmt = fmt
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run,daemon=True)
+    self._thread.start()
+
+  def _run(self) :
+    while not self._stop.wait(self.period) :
+      meters = self.meters() if callable(self.meters) else self.meters
+      if self.fmt is prometheus : self.out(prometheus(meters))
+      else :
+        for meter in meters : self.out(self.fmt(meter))
+
+  def stop(self) :
+    self._stop.set()
+    self._thread.join()
+
+
+# The entry point for command line use: the overhead per write, compared to the time the bytes take on the wire.
+# The writes of a counter are recorded once, then written to a sink directly and via a meter, alternately (best of 5 each).
+if __name__ == "__main__":
+  from ssos import SSoS
+  from peephole import Recorder
+  recorder = Recorder()
+  client = SSoS(recorder)
+  for i in range(20_000) : client.show(f"{i/10:.1f}")
+  writes = recorder.chunks
+  plain = metered = float("inf")
+  for run in range(5) :
+    sink = Recorder()
+    start = time.perf_counter()
+    for data in writes : sink.write(data)
+    plain = min(plain,time.perf_counter()-start)
+    meter = WriteMeter(Recorder(),"counter")
+    start = time.perf_counter()
+    for data in writes : meter.write(data)
+    metered = min(metered,time.perf_counter()-start)
+  overhead = (metered-plain)/len(writes)
+  wire = meter.bytes/meter.writes*BYTE_US/1_000_000
+  print( f"{meter.writes} writes of {meter.bytes/meter.writes:.1f} bytes: overhead {overhead*1e6:.2f} us per write, "
+         f"{100*overhead/wire:.1f}% of the {wire*1e6:.0f} us the bytes take on the wire" )
+  print( summary(meter) )
+  print( prometheus([meter]) )
@@ -0,0 +1,84 @@
+# virtualclock.py - Virtual time for running host code against the emulator in (much) less than real time
+# The host sleeps on a VirtualClock, and writes to a VirtualSerial, which feeds an SSoSEmulator.
+# Time only advances discretely (sleeps, bytes on the wire, delays in the firmware), and every display change is traced.
+
+import collections
+from protocol import BYTE_US
+from emulator import SSoSEmulator
+
+
+# A clock that only advances when slept on; has the sleep(), time() and monotonic() of module `time`.
+class VirtualClock :
+
+  def __init__(self,now=0.0) :
+    self.now = now # seconds
+
+  def sleep(self,seconds) :
+    self.now += seconds
+
+  def time(self) :
+    return self.now
+
+  def monotonic(self) :
+    return self.now
+
+
+# A serial port (write/read/in_waiting like pyserial) connected to an (already booted) SSoSEmulator, on virtual time.
+# Bytes written by the host at `clock.now` go on the wire one by one (`BYTE_US` each, after the bytes written before).
+# The device processes a byte when it arrives, or later when it is still busy in a delay().
+# The device has its own time `device_now` (ahead of the host when the firmware delays); the device is the clock of the emulator.
+# Every display change is appended to `trace` as (device time in seconds, patterns).
+# With `rx_size` (e.g. RX_BUFFER), a byte that arrives while `rx_size` bytes wait for the device is dropped (counted in `dropped`),
+# as the serial RX buffer of the device does.
+class VirtualSerial :
+
+  def __init__(self,clock,emulator=None,byte_s=BYTE_US/1_000_000,rx_size=None) :
+    self.clock = clock
+    self.emulator = emulator if emulator else SSoSEmulator()
+    self.emulator.clock = self
+    self.byte_s = byte_s
+    self.rx_size = rx_size
+    self.dropped = 0
+    self._starts = collections.deque() # device times at which the bytes in the RX buffer are (or were) read by the device
+    self.line_free = clock.now  # time at which the wire is free for the next byte
+    self.device_now = clock.now # time of the device
+    self.trace = [ (self.device_now,self.emulator.patterns()) ]
+
+  # Appends the display content to the trace, if it changed.
+  def _record(self) :
+    patterns = self.emulator.patterns()
+    if patterns==self.trace[-1][1] : return
+    if self.trace[-1][0]==self.device_now and len(self.trace)>1 : self.trace.pop() # shown for zero time
+    if patterns!=self.trace[-1][1] : self.trace.append( (self.device_now,patterns) )
+
+  # The clock of the emulator: the firmware calls delay().
+  def sleep(self,seconds) :
+    self._record()
+    self.device_now += seconds
+
+  def write(self,data) :
+    for ch in data :
+      self.line_free = max(self.clock.now,self.line_free) + self.byte_s
+      if self.rx_size :
+        while self._starts and self._starts[0]<=self.line_free : self._starts.popleft()
+        if len(self._starts)>=self.rx_size :
+          self.dropped += 1
+          continue
+      self.device_now = max(self.device_now,self.line_free)
+      if self.rx_size : self._starts.append(self.device_now)
+      self.emulator.loop(ch)
+      self._record()
+    return len(data)
+
+  def read(self,size=1) :
+    data = self.emulator.txbuf[:size]
+    del self.emulator.txbuf[:size]
+    return bytes(data)
+
+  @property
+  def in_waiting(self) :
+    return len(self.emulator.txbuf)
+
+  # The trace as printable lines: time in ms and the patterns in hex.
+  def trace_lines(self) :
+    return [ f"{t*1000:10.3f} ms  " + " ".join(f"{p:02X}" for p in patterns) for t,patterns in self.trace ]
@@ -0,0 +1,92 @@
+# isrcalc.py - Closed form duty cycle and flicker calculator for the ISR (drv7s.cpp), cross-checked against the simulation
+
+# For a given drv7s state, the per-unit on-time and the flicker frequencies are deterministic,
+# so they can be computed in O(1) instead of being read from a simulated `column:` log.
+# The arguments have the names of the drv7s variables (see firmware/SSoS/drv7s.cpp):
+#   brightness  - slots (of SLOTCOUNT) a unit is powered
+#   frameshi    - frames (of framecount) the blinking units are on
+#   framecount  - blinking period in frames
+#   noblinkmask - bit i set: unit i is exempt from blinking (note drv7s_noblinkmask is the inverse of the SET-BLINK-MASK argument)
+#   alwayshi    - 1: blinking disabled, 0: blinking enabled
+#
+#   python isrcalc.py             prints the metrics for the firmware defaults
+#   python isrcalc.py --verify N  compares the calculator to the simulation for N random configurations
+
+import sys
+import random
+from isrsim import IsrSim
+from isrsweep import dark_gap
+
+
+# Returns the metrics of a drv7s state as a dict:
+#   frame_ms   - time to refresh all units once
+#   refresh_hz - refresh rate of every unit
+#   gap_ms     - dark time of a unit between two refreshes
+#   blink_hz   - blinking frequency (0 if no unit blinks)
+#   on_ms      - blink on time, off_ms - blink off time
+#   duty       - per unit, the fraction of time it is powered
+def metrics(brightness=4,frameshi=0x19,framecount=0x32,noblinkmask=0,alwayshi=1,TIMER_MS=1,SLOTCOUNT=5,UNITCOUNT=4) :
+  frame_ms = TIMER_MS*SLOTCOUNT*UNITCOUNT
+  blinking = [ not alwayshi and not noblinkmask & (1<<unit) for unit in range(UNITCOUNT) ]
+  duty_refresh = brightness/(SLOTCOUNT*UNITCOUNT)
+  duty_blink = frameshi/framecount
+  return dict(
+    frame_ms = frame_ms,
+    refresh_hz = 1000/frame_ms,
+    gap_ms = TIMER_MS*(SLOTCOUNT*UNITCOUNT-brightness),
+    blink_hz = 1000/(framecount*frame_ms) if any(blinking) else 0,
+    on_ms = frameshi*frame_ms,
+    off_ms = (framecount-frameshi)*frame_ms,
+    duty = [ duty_refresh*(duty_blink if blink else 1) for blink in blinking ],
+  )
+
+
+# Computes the same metrics with the tick simulation (one full blinking period); slow, for verification only.
+def simulate(brightness=4,frameshi=0x19,framecount=0x32,noblinkmask=0,alwayshi=1,TIMER_MS=1,SLOTCOUNT=5,UNITCOUNT=4) :
+  framebuf = "".join(chr(65+i) for i in range(UNITCOUNT))
+  frameticks = SLOTCOUNT*UNITCOUNT
+  config = dict(framebuf=framebuf,brightness=brightness,TIMER_MS=TIMER_MS,SLOTCOUNT=SLOTCOUNT,UNITCOUNT=UNITCOUNT)
+  sim = IsrSim(frameticks*framecount,framecount=framecount,frameson=framecount if alwayshi else frameshi,noblink=noblinkmask & ((1<<UNITCOUNT)-1),**config)
+  refresh = IsrSim(frameticks,**config)
+  return dict(
+    gap_ms = max(dark_gap(refresh,unit) for unit in range(UNITCOUNT))*TIMER_MS,
+    duty = sim.dutycycle().tolist(),
+  )
+
+
+# Compares metrics() to simulate() for `count` random configurations; returns the list of mismatching configurations.
+def verify(count,seed=0) :
+  rnd = random.Random(seed)
+  failures = []
+  for _ in range(count) :
+    SLOTCOUNT = rnd.randint(1,8)
+    UNITCOUNT = rnd.randint(1,16)
+    framecount = rnd.randint(2,255)
+    config = dict(
+      brightness = rnd.randint(1,SLOTCOUNT),
+      frameshi = rnd.randint(1,framecount-1),
+      framecount = framecount,
+      noblinkmask = rnd.randrange(1<<UNITCOUNT),
+      alwayshi = rnd.randint(0,1),
+      TIMER_MS = rnd.randint(1,4),
+      SLOTCOUNT = SLOTCOUNT,
+      UNITCOUNT = UNITCOUNT,
+    )
+    calc = metrics(**config)
+    sim = simulate(**config)
+    if calc["gap_ms"]!=sim["gap_ms"] or any( abs(c-s)>1e-12 for c,s in zip(calc["duty"],sim["duty"]) ) :
+      failures.append(config)
+  return failures
+
+
+# The entry point for command line use
+if __name__ == "__main__":
+  if len(sys.argv)>2 and sys.argv[1]=="--verify" :
+    count = int(sys.argv[2])
+    failures = verify(count)
+    for config in failures :
+      print( f"mismatch: {config}" )
+    print( f"verified {count} random configurations: {count-len(failures)} match, {len(failures)} mismatch" )
+  else :
+    for key,value in metrics().items() :
+      print( f"{key:10}: {value}" )
@@ -0,0 +1,103 @@
+# isrsim.py - Vectorized simulation of the ISR, covering models 1 to 4, for millions of ticks
+
+# The models isr1.py to isr4.py step the ISR one tick at a time and build the log by string concatenation.
+# That is fine for explaining the models, but only practical for ~100 ticks.
+# This simulation computes the slot/unit/frame/rows/column of every tick in one go (NumPy arrays),
+# and renders the textual log (as the models print it) only for the window asked for.
+#
+# Model 1: SLOTCOUNT=1 (no brightness slots) and no blinking
+# Model 2: brightness slots, no blinking
+# Model 3: blinking with framecount/frameson
+# Model 4: blinking with noblink mask
+
+import sys
+import time
+import numpy as np
+
+
+class IsrSim :
+
+  # The configuration has the names used in isr4.py; `ticks` is the number of ISR ticks to simulate.
+  # The defaults for brightness, framecount, frameson and noblink disable the features of the later models.
+  def __init__(self,ticks,framebuf="ABCD",brightness=None,framecount=1,frameson=None,noblink=0,TIMER_MS=1,SLOTCOUNT=5,UNITCOUNT=4,model=4) :
+    if model==1 : SLOTCOUNT = 1
+    if brightness is None : brightness = SLOTCOUNT
+    if frameson is None : frameson = framecount
+    assert TIMER_MS>=1
+    assert UNITCOUNT==len(framebuf)
+    assert 1<=brightness<=SLOTCOUNT
+    assert 1<=frameson<=framecount
+    assert noblink < 2**UNITCOUNT
+    self.ticks = ticks
+    self.framebuf = framebuf
+    self.brightness = brightness
+    self.framecount = framecount
+    self.frameson = frameson
+    self.noblink = noblink
+    self.TIMER_MS = TIMER_MS
+    self.SLOTCOUNT = SLOTCOUNT
+    self.UNITCOUNT = UNITCOUNT
+    self.model = model
+    self._simulate()
+
+  # Computes the ISR state after every tick. The ISR state starts at the last slot/unit/frame, so the first tick rolls over to 0.
+  def _simulate(self) :
+    k = np.arange(self.ticks,dtype=np.int64)
+    self.slot = (k % self.SLOTCOUNT).astype(np.uint8)
+    self.unit = (k // self.SLOTCOUNT % self.UNITCOUNT).astype(np.uint8)
+    self.frame = (k // (self.SLOTCOUNT*self.UNITCOUNT) % self.framecount).astype(np.uint8)
+    # A unit is lit in the "on" frames, or always when exempt from blinking
+    lit = (self.frame < self.frameson) | ((self.noblink >> self.unit.astype(np.int64)) & 1).astype(bool)
+    # Column: the unit is switched on at slot 0 (if lit), and off when the slot reaches the brightness level
+    self.column = np.where( lit & (self.slot < self.brightness), self.unit, -1 ).astype(np.int8)
+    # Rows: keep the segments of the unit that was last switched on (-1 is unknown, before any unit was on)
+    switched = np.where( lit & (self.slot==0), k, -1 )
+    np.maximum.accumulate(switched,out=switched)
+    self.rows = np.where( switched>=0, self.unit[switched], -1 ).astype(np.int8)
+
+  # Fraction of the ticks each unit is powered (the column is on).
+  def dutycycle(self) :
+    return np.bincount(self.column[self.column>=0],minlength=self.UNITCOUNT) / self.ticks
+
+  # The separators in the log before every tick of [start,stop), as the models print them.
+  def _separators(self,start,stop) :
+    slot = self.slot[start:stop]
+    unit = self.unit[start:stop]
+    frame = self.frame[start:stop]
+    seps = np.full(stop-start,'',dtype=object)
+    if self.model>=2 : seps[slot==0] = ' '
+    seps[(slot==0) & (unit==0)] = '|'
+    if self.model>=3 : seps[(slot==0) & (unit==0) & (frame==0)] = ']['
+    if len(seps)>0 and seps[0]=='][' : seps[0] = '['
+    return seps
+
+  # Renders the log lines of the models (slot, unit, frame, rows, column) for the ticks [start,stop).
+  def log(self,start=0,stop=None) :
+    if stop is None : stop = self.ticks
+    seps = self._separators(start,stop)
+    digits = lambda values : [ chr(v+48) for v in values.tolist() ]
+    rows = [ self.framebuf[r] if r>=0 else '?' for r in self.rows[start:stop].tolist() ]
+    column = [ chr(c+48) if c>=0 else '-' for c in self.column[start:stop].tolist() ]
+    lines = {}
+    if self.model>=2 : lines["slot  "] = digits(self.slot[start:stop])
+    lines["unit  "] = digits(self.unit[start:stop])
+    if self.model>=3 : lines["frame "] = digits(self.frame[start:stop])
+    lines["rows  "] = rows
+    lines["column"] = column
+    return [ f"{name}: " + "".join(s+c for s,c in zip(seps,chars)) for name,chars in lines.items() ]
+
+
+# The entry point for command line test: the configuration of isr4.py, for many ticks (optional argument)
+if __name__ == "__main__":
+  ticks = int(sys.argv[1]) if len(sys.argv)>1 else 60*1000 # one minute of 1 ms ticks
+  start = time.perf_counter()
+  sim = IsrSim(ticks,framebuf="ABCD",brightness=4,framecount=5,frameson=3,noblink=0b0101)
+  duration = time.perf_counter()-start
+  print( f"user  : content '{sim.framebuf}', brightness {sim.brightness}/{sim.SLOTCOUNT}, blink={bin(sim.noblink)}-{sim.frameson}/{sim.framecount}")
+  print( f"system: frame is {sim.SLOTCOUNT*sim.UNITCOUNT} ISR ticks of {sim.TIMER_MS} ms ({sim.SLOTCOUNT} brightness levels for {sim.UNITCOUNT} units), blinking period is {sim.framecount} frames")
+  print()
+  for line in sim.log(0,sim.SLOTCOUNT*sim.UNITCOUNT*sim.framecount+5) :
+    print(line)
+  print()
+  print( f"simulated {ticks} ticks ({ticks*sim.TIMER_MS/1000:.1f} s) in {duration*1000:.1f} ms")
+  print( "duty cycle per unit: " + " ".join(f"{d:.3f}" for d in sim.dutycycle()) )
@@ -0,0 +1,106 @@
+# isrsweep.py - Sweeps ISR configurations, evaluating each with the simulation (isrsim.py) in a process pool
+
+# Where isr4.py asserts one hand-edited configuration, this evaluates all combinations of ranges of
+# TIMER_MS, SLOTCOUNT, UNITCOUNT, brightness, framecount, frameson and noblink masks.
+# For each configuration it reports the refresh rate, the per-unit duty cycle, the worst-case dark gap and a flicker risk (from the refresh rate).
+#
+# Ranges are passed as comma separated values and/or a-b intervals, e.g.
+#   python isrsweep.py --units 4,8,16 --timer 1-2 --brightness 1-5 --framecount 50 --frameson 25 --noblink 0,5
+
+import sys
+import argparse
+import itertools
+import multiprocessing
+from isrsim import IsrSim
+
+
+# The flicker risk is rated on the refresh period (every unit is lit once per period, whatever its brightness)
+FLICKER_MS_HIGH   = 30 # A refresh period longer than this (refresh below ~33Hz) is visible flicker
+FLICKER_MS_MEDIUM = 20 # A refresh period longer than this (refresh below 50Hz, what the asserts of isr1..4.py reject) may be visible in peripheral vision or when moving
+
+
+# Parses "1,3,5-8" into [1,3,5,6,7,8]
+def parse_range(text) :
+  values = []
+  for part in text.split(",") :
+    if "-" in part :
+      lo,hi = part.split("-")
+      values.extend(range(int(lo,0),int(hi,0)+1))
+    else :
+      values.append(int(part,0))
+  return values
+
+
+# Yields all valid configurations (as dicts) for the ranges; brightness, frameson and noblink are clipped to what the other values allow.
+def configurations(timers,slotcounts,unitcounts,brightnesses,framecounts,frameson_list,noblinks) :
+  for TIMER_MS,SLOTCOUNT,UNITCOUNT,brightness,framecount,frameson,noblink in itertools.product(timers,slotcounts,unitcounts,brightnesses,framecounts,frameson_list,noblinks) :
+    if not 1<=brightness<=SLOTCOUNT : continue
+    if not 1<=frameson<=framecount : continue
+    if not noblink < 2**UNITCOUNT : continue
+    yield dict(TIMER_MS=TIMER_MS,SLOTCOUNT=SLOTCOUNT,UNITCOUNT=UNITCOUNT,brightness=brightness,framecount=framecount,frameson=frameson,noblink=noblink)
+
+
+# Longest run of ticks (cyclic, the simulation covers whole periods) that `unit` is not powered.
+def dark_gap(sim,unit) :
+  on = (sim.column==unit).nonzero()[0]
+  if len(on)==0 : return sim.ticks
+  gaps = on[1:]-on[:-1]-1
+  wrap = on[0]+sim.ticks-on[-1]-1
+  return int(max(gaps.max(initial=0),wrap))
+
+
+# Evaluates one configuration with the simulation; returns the configuration extended with the metrics.
+# The duty cycle includes blinking; the dark gap is the refresh gap (in the "on" frames), since the blink "off" time is intended.
+def evaluate(config) :
+  framebuf = "".join(chr(65+i) for i in range(config["UNITCOUNT"]))
+  frameticks = config["SLOTCOUNT"]*config["UNITCOUNT"]
+  sim = IsrSim(frameticks*config["framecount"],framebuf=framebuf,**config)
+  refresh = IsrSim(frameticks,framebuf=framebuf,**dict(config,framecount=1,frameson=1))
+  gap_ms = max(dark_gap(refresh,unit) for unit in range(config["UNITCOUNT"])) * config["TIMER_MS"]
+  result = dict(config)
+  period_ms = config["TIMER_MS"]*frameticks
+  result["ok"] = period_ms<=20 # the assert of isr4.py
+  result["refresh_hz"] = 1000/period_ms
+  result["duty"] = sim.dutycycle().tolist()
+  result["gap_ms"] = gap_ms
+  result["flicker"] = "high" if period_ms>FLICKER_MS_HIGH else "medium" if period_ms>FLICKER_MS_MEDIUM else "low"
+  return result
+
+
+# Evaluates all `configs` in a process pool (`workers` processes, default one per CPU); returns the results in order.
+def sweep(configs,workers=None) :
+  configs = list(configs)
+  with multiprocessing.Pool(workers) as pool :
+    return pool.map(evaluate,configs,chunksize=max(1,len(configs)//(4*(workers or multiprocessing.cpu_count()))))
+
+
+# Prints `results` as a table (or as CSV).
+def print_table(results,csv=False,file=sys.stdout) :
+  columns = ["TIMER_MS","SLOTCOUNT","UNITCOUNT","brightness","framecount","frameson","noblink","ok","refresh_hz","gap_ms","flicker","duty"]
+  if csv :
+    print( ",".join(columns), file=file )
+    for r in results :
+      print( ",".join( " ".join(f"{d:.4f}" for d in r[c]) if c=="duty" else str(r[c]) for c in columns ), file=file )
+    return
+  print( "timer slots units brit fcnt fon noblink   ok refresh  gap flicker duty", file=file )
+  for r in results :
+    duty = " ".join(f"{d:.3f}" for d in r["duty"])
+    print( f"{r['TIMER_MS']:5} {r['SLOTCOUNT']:5} {r['UNITCOUNT']:5} {r['brightness']:4} {r['framecount']:4} {r['frameson']:3} {r['noblink']:#7x} {'yes' if r['ok'] else 'no':>4} {r['refresh_hz']:5.1f}Hz {r['gap_ms']:2}ms {r['flicker']:7} {duty}", file=file )
+
+
+# The entry point for command line use
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Sweep ISR configurations")
+  parser.add_argument("--timer",      default="1",  help="TIMER_MS values (default 1)")
+  parser.add_argument("--slots",      default="5",  help="SLOTCOUNT values (default 5)")
+  parser.add_argument("--units",      default="4",  help="UNITCOUNT values (default 4)")
+  parser.add_argument("--brightness", default="1-5",help="brightness values (default 1-5)")
+  parser.add_argument("--framecount", default="1",  help="framecount values (default 1, no blinking)")
+  parser.add_argument("--frameson",   default="1",  help="frameson values (default 1)")
+  parser.add_argument("--noblink",    default="0",  help="noblink masks (default 0)")
+  parser.add_argument("--workers",    type=int,     help="number of processes (default one per CPU)")
+  parser.add_argument("--csv",        action="store_true", help="print CSV instead of a table")
+  args = parser.parse_args()
+  configs = configurations(parse_range(args.timer),parse_range(args.slots),parse_range(args.units),parse_range(args.brightness),
+                           parse_range(args.framecount),parse_range(args.frameson),parse_range(args.noblink))
+  print_table(sweep(configs,args.workers),args.csv)
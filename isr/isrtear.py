@@ -0,0 +1,137 @@
+# isrtear.py - Detects and counts torn frames: frames in which the ISR shows a mix of old and new display content
+
+# The ISR shows the units one by one (unit 0 at slot 0 of the frame, unit 1 five ticks later, etc),
+# while loop() of the firmware writes drv7s_framebuf[] byte by byte, as the bytes arrive over serial (~87us per byte).
+# An update that writes the framebuffer more than once (e.g. "\fABCD": clear, then four chars) may be shown half done:
+# some units of a frame cleared, others old or new. That is a torn frame.
+#
+# The bytes are run through the emulator of the firmware (../host/emulator.py), which gives the framebuffer after every byte.
+# The simulation (isrsim.py) gives the tick at which every unit of every frame latches its rows.
+# A frame is torn when a unit shows a pattern of neither the display state before nor after an update
+# (the states the host intended), e.g. a unit blanked by the \f, or a char without its dot.
+# Since the phase of the ISR with respect to the host is unknown, the count is averaged over phases.
+#
+#   python isrtear.py   compares send modes of the client for a counter (like the LEGO numbers demo)
+
+import os
+import sys
+import random
+import numpy as np
+from isrsim import IsrSim
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","host"))
+from protocol import BYTE_US
+from emulator import SSoSEmulator
+
+
+# Returns the byte arrival schedule for `writes` (a list of (time in ms, bytes)) as a list of (time in ms, byte, last):
+# the bytes of a write go on the wire one after the other (`byte_ms` each), after the bytes of earlier writes.
+# `last` is True for the last byte of a write (after it, the display shows what the host intended).
+def arrivals(writes,byte_ms=BYTE_US/1000) :
+  schedule = []
+  free = 0.0 # time the wire is free
+  for t,data in writes :
+    free = max(free,t)
+    for i,ch in enumerate(data) :
+      free += byte_ms
+      schedule.append( (free,ch,i==len(data)-1) )
+  return schedule
+
+
+# Runs the byte arrival `schedule` through an emulator; returns the times (ms) the framebuffer changed, the framebuffers
+# (array of changes+1 rows of UNITCOUNT patterns, row 0 is the state before the first byte), and for every row whether
+# it is an intended state. Bytes are processed when they arrive, or later when the firmware is in delay() (char mode scroll).
+def timeline(schedule,emulator=None) :
+  if emulator is None : emulator = SSoSEmulator()
+  times = [-np.inf]
+  framebufs = [emulator.patterns()]
+  intended = [True]
+  busy = 0.0 # time loop() is done with the previous byte
+  for t,ch,last in schedule :
+    t = max(t,busy)
+    delayed_ms = emulator.delayed_ms
+    emulator.loop(ch)
+    busy = t+emulator.delayed_ms-delayed_ms
+    if emulator.patterns()!=framebufs[-1] :
+      times.append(t)
+      framebufs.append(emulator.patterns())
+      intended.append(last)
+    elif last :
+      intended[-1] = True
+  return np.array(times), np.array(framebufs,dtype=np.uint8), np.array(intended)
+
+
+# Counts the torn frames of the framebuffer `timeline` (see above), for the ISR started at `phase_ms`.
+# Returns (frames,torn), where `torn` is a boolean array with an element per frame.
+def torn_frames(times,framebufs,intended,phase_ms=0.0,TIMER_MS=1,SLOTCOUNT=5,UNITCOUNT=4) :
+  end = times[-1] if len(times)>1 else 0.0
+  frameticks = SLOTCOUNT*UNITCOUNT
+  frames = int((end-phase_ms)/(TIMER_MS*frameticks))+2
+  sim = IsrSim(frames*frameticks,framebuf="ABCD"[:UNITCOUNT].ljust(UNITCOUNT,"?"),TIMER_MS=TIMER_MS,SLOTCOUNT=SLOTCOUNT,UNITCOUNT=UNITCOUNT)
+  # The tick at which every unit of every frame latches its rows, as time: array of (frames,UNITCOUNT)
+  latch = phase_ms + TIMER_MS*np.flatnonzero(sim.slot==0).reshape(frames,UNITCOUNT)
+  # The row of the timeline every unit shows (the last change before the latch), and the patterns it shows
+  row = np.searchsorted(times,latch,side="right")-1
+  shown = framebufs[row,np.arange(UNITCOUNT)]
+  # A unit that latches in the middle of an update must show its pattern of the intended state before or after the update.
+  # (A frame that latches some units before and some after an atomic update is not torn: every unit shows a state
+  # the host intended, and the next frame is complete. That is inherent to multiplexing, it is not visible.)
+  intended_rows = np.flatnonzero(intended)
+  before = intended_rows[np.searchsorted(intended_rows,row,side="right")-1]
+  after = intended_rows[np.minimum(np.searchsorted(intended_rows,row,side="left"),len(intended_rows)-1)]
+  units = np.arange(UNITCOUNT)
+  torn = ( (shown!=framebufs[before,units]) & (shown!=framebufs[after,units]) ).any(axis=1)
+  return frames,torn
+
+
+# Returns the fraction of frames that are torn, and the fraction of updates (writes) that show at least one torn frame,
+# averaged over `phases` random ISR phases.
+def tearing(writes,phases=20,seed=0,emulator=None) :
+  times,framebufs,intended = timeline(arrivals(writes),emulator)
+  updates = np.array([t for t,data in writes])
+  rnd = random.Random(seed)
+  torn_frame_total = torn_update_total = frame_total = 0
+  for _ in range(phases) :
+    phase_ms = rnd.uniform(0,20)
+    frames,torn = torn_frames(times,framebufs,intended,phase_ms)
+    frame_total += frames
+    torn_frame_total += torn.sum()
+    # A torn frame belongs to the update that was written last before its first latch
+    first_latch = phase_ms + 20*np.flatnonzero(torn)
+    torn_update_total += len(np.unique(np.searchsorted(updates,first_latch,side="right")))
+  return torn_frame_total/frame_total, torn_update_total/(phases*len(writes))
+
+
+# Returns the writes of a counter (0.0 to 99.9 in steps of 0.1, an update every `period_ms`), sent via `send` (text to bytes).
+def counter_writes(send,period_ms=100,count=1000) :
+  return [ (k*period_ms,send(f"{k/10:.1f}")) for k in range(count) ]
+
+
+# The entry point for command line use: the tearing of a counter, for several send modes
+if __name__ == "__main__":
+  from ssos import SSoS
+  from peephole import Recorder
+
+  # Returns a send function (text to bytes) of a client, with `setup` applied to it first
+  def client(setup=lambda ssos : None,**kwargs) :
+    recorder = Recorder()
+    ssos = SSoS(recorder,**kwargs)
+    setup(ssos)
+    def send(text) :
+      ssos.show(text)
+      data = b"".join(recorder.chunks) # the first time including the bytes of the setup
+      recorder.chunks.clear()
+      return data
+    return send
+
+  modes = {
+    "\\f + text (LEGO demos)  " : lambda text : b"\f"+text.rjust(5 if "." in text else 4).encode(),
+    "client, char mode        " : client(),
+    "client, char mode, atomic" : client(atomic=True),
+    "client, line mode        " : client(lambda ssos : ssos.set_char(False)),
+  }
+  for name,send in modes.items() :
+    writes = [(0,b"\0")] + counter_writes(send)
+    frames,updates = tearing(writes)
+    size = sum(len(data) for t,data in writes)
+    print( f"{name}: {size:5} bytes, {100*frames:5.2f}% of frames torn, {100*updates:5.1f}% of updates show a torn frame" )
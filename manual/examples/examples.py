@@ -2,11 +2,17 @@
 
 import serial
 import time
+import sys
+import os
 
-ssos = serial.Serial(None,115200) # port=None, so not yet opened
-ssos.dtr = False # Makes sure the board does not reset (would take 2 seconds)
-ssos.port='COM3' # Specify port
-ssos.open()      # Now open (fast)
+ssos = None # The opened serial port, see main (virtualrun.py sets an emulated one)
+
+def open_ssos(port) :
+  ssos = serial.Serial(None,115200) # port=None, so not yet opened
+  ssos.dtr = False # Makes sure the board does not reset (would take 2 seconds)
+  ssos.port = port # Specify port
+  ssos.open()      # Now open (fast)
+  return ssos
 
 def demo_0x00_RESET():
   ssos.write( b'\0HI')
@@ -192,28 +198,36 @@ def demo_0x1F_RESET():
   ssos.write( b'\x1f75')
   time.sleep(1)
 
-demo_0x00_RESET()
-demo_0x01_SET_FONT()
-demo_0x02_SET_BRIGHTNESS()
-demo_0x03_SET_BLINK_MASK()
-demo_0x04_SET_BLINK_TIMES()
-demo_0x05_SHOW_STRINGS()
-demo_0x06_CURSOR_RIGHT()
-#demo_0x07_BLINK_ENABLE()
-demo_0x08_CURSOR_LEFT()
-demo_0x09_CURSOR_EOLN()
-demo_0x0A_LINE_COMMIT()
-#demo_0x0B_BLINK_DISABLE()
-demo_0x0C_CLEAR_AND_HOME()
-demo_0x0D_CURSOR_HOME()
-demo_0x0E_DOT_DISABLE()
-#demo_0x0F_0x0F DOT_ENABLE()
-demo_0x10_CHAR_ENABLE()
-demo_0x10_CHAR_ENABLE_overflow()
-demo_0x11_CHAR_DISABLE()
-demo_0x11_CHAR_DISABLE_overflow()
-demo_0x12_CHAR_TIME()
-demo_0x13_PATTERN_ONE()
-demo_0x14_PATTERN_ALL()
-demo_0x1F_RESET()
-
+# The entry point for command line use: run all demos on the port passed (e.g. the pty of host/emulator.py)
+# With a second argument, everything sent is also recorded in that capture file (see host/capture.py).
+if __name__ == "__main__":
+  ssos = open_ssos(sys.argv[1] if len(sys.argv)>1 else 'COM3')
+  if len(sys.argv)>2 :
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","host"))
+    from capture import CaptureRecorder
+    ssos = CaptureRecorder(ssos,sys.argv[2])
+  demo_0x00_RESET()
+  demo_0x01_SET_FONT()
+  demo_0x02_SET_BRIGHTNESS()
+  demo_0x03_SET_BLINK_MASK()
+  demo_0x04_SET_BLINK_TIMES()
+  demo_0x05_SHOW_STRINGS()
+  demo_0x06_CURSOR_RIGHT()
+  #demo_0x07_BLINK_ENABLE()
+  demo_0x08_CURSOR_LEFT()
+  demo_0x09_CURSOR_EOLN()
+  demo_0x0A_LINE_COMMIT()
+  #demo_0x0B_BLINK_DISABLE()
+  demo_0x0C_CLEAR_AND_HOME()
+  demo_0x0D_CURSOR_HOME()
+  demo_0x0E_DOT_DISABLE()
+  #demo_0x0F_0x0F DOT_ENABLE()
+  demo_0x10_CHAR_ENABLE()
+  demo_0x10_CHAR_ENABLE_overflow()
+  demo_0x11_CHAR_DISABLE()
+  demo_0x11_CHAR_DISABLE_overflow()
+  demo_0x12_CHAR_TIME()
+  demo_0x13_PATTERN_ONE()
+  demo_0x14_PATTERN_ALL()
+  demo_0x1F_RESET()
+  if len(sys.argv)>2 : ssos.close()
@@ -0,0 +1,48 @@
+# virtualrun.py - Runs the demos of examples.py against the emulator (../../host) on a virtual clock
+# Every demo completes in milliseconds, and prints a timestamped trace of the display content.
+# Pass (parts of) demo names to run only those demos, e.g. `python virtualrun.py 0x12 0x14`.
+# With --rx the RX buffer of the device is modeled (bytes that do not fit are lost, as on the real device),
+# with --pace the demos write via a Pacer (../../host/pacing.py), which prevents that.
+
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","..","host"))
+from virtualclock import VirtualClock, VirtualSerial
+from pacing import Pacer
+from protocol import RX_BUFFER
+import examples
+
+
+# All demo functions of examples.py, in the order they are defined
+demos = [ func for name,func in vars(examples).items() if name.startswith("demo_0x") ]
+
+
+# Runs `demo` on virtual time (the `ssos` and `time` of examples.py are replaced).
+# With `rx`, the virtual serial drops bytes that do not fit in the RX buffer of the device; with `pace`, the demo writes via a Pacer.
+# Returns the virtual serial (with the trace) and the wall time in seconds.
+def run(demo,rx=False,pace=False) :
+  clock = VirtualClock()
+  ssos = VirtualSerial(clock,rx_size=RX_BUFFER if rx else None)
+  examples.ssos = Pacer(ssos,clock) if pace else ssos
+  examples.time = clock
+  start = time.perf_counter()
+  demo()
+  return ssos, time.perf_counter()-start
+
+
+# The entry point for command line use
+if __name__ == "__main__":
+  options = [ arg for arg in sys.argv[1:] if arg.startswith("--") ]
+  names = [ arg for arg in sys.argv[1:] if not arg.startswith("--") ]
+  total = 0
+  for demo in demos :
+    if names and not any(name in demo.__name__ for name in names) : continue
+    ssos,wall = run(demo,"--rx" in options,"--pace" in options)
+    total += wall
+    virtual = max(ssos.clock.now,ssos.device_now)
+    dropped = f", {ssos.dropped} bytes lost" if ssos.dropped else ""
+    print( f"{demo.__name__}: {virtual:.3f} s virtual, {wall*1000:.3f} ms wall{dropped}")
+    for line in ssos.trace_lines() :
+      print( "  "+line )
+  print( f"total: {total*1000:.3f} ms wall")